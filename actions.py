@@ -1,10 +1,15 @@
+import hashlib, time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from config import Config
 from system_requests import system_requests
 from utils import utils
 from logconfig import logger
-from threadpool import run_on_threadpool
+from threadpool import run_on_threadpool, run_slow_io, lane_stats
 from masternode_helpers import masternode_helpers
 from updater import updater
 from cacher import cacher
+from store import page
+from ttl_cache import usable
 
 class Actions:
     # -------------------------
@@ -12,36 +17,98 @@ class Actions:
     # -------------------------
     SYSTEM_ACTIONS = {
         "active_networks": lambda: list(masternode_helpers._active_networks_config.keys()),
+        "cache_status": lambda: cacher.get_cache_status(),
         "current_node_version": lambda: run_on_threadpool(system_requests.get_node_version),
         "current_plugin_version": lambda: updater._current_plugin_version,
-        "external_ip": lambda: run_on_threadpool(system_requests.get_external_ip),
+        "executor_stats": lambda: lane_stats(),
+        "external_ip": lambda: run_slow_io(system_requests.get_external_ip),
         "hostname": lambda: system_requests._hostname,
-        "latest_node_version": lambda: run_on_threadpool(utils.get_latest_node_version),
+        "latest_node_version": lambda: run_slow_io(utils.get_latest_node_version),
         "latest_plugin_version": lambda: updater._latest_plugin_version,
-        "node_cpu_usage": lambda: run_on_threadpool(system_requests.get_node_cpu_usage),
+        "live_cache_stats": lambda: masternode_helpers.get_live_cache_stats(),
+        "node_cpu_usage": lambda: system_requests.get_node_cpu_usage(),
+        "node_cpu_usage_avg": lambda: system_requests.get_node_cpu_usage_avg(),
         "plugin_logs": lambda: run_on_threadpool(system_requests.get_plugin_logs),
         "node_memory_usage": lambda: run_on_threadpool(system_requests.get_node_memory_usage),
+        "node_memory_usage_avg": lambda: system_requests.get_node_memory_usage_avg(),
         "node_pid": lambda: system_requests._node_pid,
         "node_running_as_service": lambda: system_requests._is_running_as_service,
         "node_uptime": lambda: run_on_threadpool(system_requests.get_node_uptime),
         "plugin_update_available": lambda: updater._update_available,
+        "rpc_backends": lambda: utils._rpc_router.stats(),
         "plugin_release_notes": lambda: updater._release_notes,
         "system_uptime": lambda: run_on_threadpool(system_requests.get_system_uptime),
         "system_total_memory": lambda: run_on_threadpool(system_requests.get_system_total_memory)
     }
 
+    # -------------------------
+    # Network actions
+    # -------------------------
+    # Live resolvers, only called when requested. Everything else is read from the cache.
+    NETWORK_ACTIONS = {
+        "autocollect_status": lambda net: masternode_helpers.get_autocollect_status(net),
+        "network_status": lambda net: masternode_helpers.get_network_status(net),
+        "node_in_node_list": lambda net: masternode_helpers.get_node_in_node_list(net),
+        "reward_wallet_address": lambda net: masternode_helpers._active_networks_config[net]["wallet"],
+        "reward_wallet_balance": lambda net: masternode_helpers.get_wallet_balance(
+            net, masternode_helpers._active_networks_config[net]["wallet"]
+        ),
+        "sovereign_wallet_balance": lambda net: Actions._get_sovereign_wallet_balance(net),
+        "token_price": lambda net: masternode_helpers.get_token_price(net),
+    }
+
+    # Scraped from outside sites, kept off the interactive lane
+    SLOW_NETWORK_ACTIONS = {"token_price"}
+
+    @staticmethod
+    def _get_sovereign_wallet_balance(network):
+        # Prefer the cached node info, only ask the node if we don't have it yet
+        sovereign_addr = cacher.get_cache(network).get("sovereign_reward_wallet_address")
+        if not sovereign_addr:
+            node_info = masternode_helpers.get_node_info(network) or {}
+            sovereign_addr = node_info.get("sovereign_reward_wallet_address")
+        if not sovereign_addr:
+            return None
+        return masternode_helpers.get_wallet_balance(network, sovereign_addr)
+
+    # Last value every live action produced, served along with the timed out marker
+    _last_values = {}
+
     @staticmethod
-    def _resolve_value(val):
+    def request_deadline(timeout=None):
+        return time.monotonic() + (timeout or Config.REQUEST_TIMEOUT)
+
+    @staticmethod
+    def _track(key, val):
+        # Remember the result even when it arrives after the request gave up on it
+        if hasattr(val, "add_done_callback"):
+            def remember(future):
+                # A failed call comes back as None or {}, it mustn't replace the last good value
+                if not future.cancelled() and future.exception() is None and usable(future.result()):
+                    Actions._last_values[key] = future.result()
+            val.add_done_callback(remember)
+        return val
+
+    @staticmethod
+    def _resolve_value(val, deadline=None, key=None):
+        # Futures were all submitted up front, so waiting on them one by one
+        # against the same deadline costs no more than the slowest one
         try:
-            return val.result()
+            if deadline is None:
+                return val.result()
+            return val.result(timeout=max(0, deadline - time.monotonic()))
         except AttributeError:
             return val
+        except FutureTimeoutError:
+            val.cancel()
+            logger.warning(f"Action {key} did not finish before the request deadline")
+            return {"timed_out": True, "last_value": Actions._last_values.get(key)}
         except Exception as e:
-            logger.error(f"Error resolving system action value: {e}", exc_info=True)
+            logger.error(f"Error resolving action value: {e}", exc_info=True)
             return None
 
     @staticmethod
-    def parse_system_actions(actions_requested):
+    def parse_system_actions(actions_requested, deadline=None):
         if "help" in actions_requested:
             return {"available_system_actions": sorted(Actions.SYSTEM_ACTIONS.keys())}
 
@@ -50,7 +117,7 @@ class Actions:
                 return {"update_plugin": updater._update_blocked_reason}
             if updater._update_available and updater._tarball_url:
                 try:
-                    run_on_threadpool(updater.download_and_update, updater._tarball_url) # we don't really need the result, if it fails, then it fails
+                    run_slow_io(updater.download_and_update, updater._tarball_url) # we don't really need the result, if it fails, then it fails
                     return {"update_plugin": "Update initiated, node will be restarted!"}
                 except Exception as e:
                     logger.error(f"Error initiating plugin update: {e}", exc_info=True)
@@ -65,71 +132,87 @@ class Actions:
             else actions_requested
         )
 
+        pending = {}
         for action in actions_to_process:
             if action in Actions.SYSTEM_ACTIONS:
-                val = Actions.SYSTEM_ACTIONS[action]()
-                result[action] = Actions._resolve_value(val)
+                pending[action] = Actions._track(action, Actions.SYSTEM_ACTIONS[action]())
             else:
                 result[action] = f"unknown system action: {action}"
+
+        deadline = deadline or Actions.request_deadline()
+        for action, val in pending.items():
+            result[action] = Actions._resolve_value(val, deadline, action)
         return result
 
     @staticmethod
-    def parse_network_actions(networks, requested):
+    def get_cached_etag(networks, requested, list_query=None):
+        # Only responses built purely from cached snapshots can be revalidated
+        if not networks or not requested:
+            return None
+        etags = []
+        for net in networks:
+            if net not in masternode_helpers._active_networks_config:
+                return None
+            snapshot = cacher.get_snapshot(net)
+            if not snapshot:
+                return None
+            for name in requested:
+                if name in Actions.NETWORK_ACTIONS or name not in snapshot.values:
+                    return None
+            etags.append(snapshot.etag)
+        query = ",".join(f"{k}={v}" for k, v in sorted((list_query or {}).items()))
+        digest = hashlib.sha1("|".join(etags + [",".join(networks), ",".join(requested), query]).encode())
+        return '"' + digest.hexdigest()[:20] + '"'
+
+    @staticmethod
+    def _run_network_action(net, name):
+        try:
+            return Actions.NETWORK_ACTIONS[name](net)
+        except Exception as e:
+            logger.error(f"Error running action {name} for {net}: {e}", exc_info=True)
+            return None
+
+    @staticmethod
+    def parse_network_actions(networks, requested, list_query=None, deadline=None):
         result = {}
+        pending = {}
 
+        # Submit every live action of every network first, then collect them all
         for net in networks:
             if net not in masternode_helpers._active_networks_config:
                 logger.warning(f"Requested network '{net}' is not in active networks config.")
                 result[net] = "unsupported network"
                 continue
 
-            wallet_addr = masternode_helpers._active_networks_config[net]["wallet"]
-            sovereign_addr = None
-            node_info = masternode_helpers.get_node_info(net) or {}
-            if node_info:
-                sovereign_addr = node_info.get("sovereign_reward_wallet_address")
-
-            actions = {
-                "autocollect_status": masternode_helpers.get_autocollect_status(net),
-                "network_status": masternode_helpers.get_network_status(net),
-                "node_in_node_list": masternode_helpers.get_node_in_node_list(net),
-                "reward_wallet_address": wallet_addr,
-            }
-
-            if cacher.rewards.get(net):
-                actions["rewards_full"] = cacher.rewards[net]
-
-            if cacher.sovereign_rewards.get(net):
-                actions["sovereign_rewards_full"] = cacher.sovereign_rewards[net]
-
-            cache = cacher.get_cache(net)
-            if cache:
-                for k, v in cache.items():
-                    actions[k] = v
-
-            actions["token_price"] = masternode_helpers.get_token_price(net)
-            actions["reward_wallet_balance"] = masternode_helpers.get_wallet_balance(net, wallet_addr)
-            if sovereign_addr:
-                actions["sovereign_wallet_balance"] = masternode_helpers.get_wallet_balance(net, sovereign_addr)
+            snapshot = cacher.get_snapshot(net)
+            cached = snapshot.values if snapshot else {}
 
             if "help" in requested:
-                result[net] = sorted(actions.keys())
+                result[net] = sorted(set(Actions.NETWORK_ACTIONS) | set(cached))
                 continue
 
-            actions_to_run = actions if "all" in requested else {a: actions[a] for a in requested if a in actions}
-
+            names = Actions.NETWORK_ACTIONS if "all" in requested else requested
+            live = {}
             net_result = {}
-            for name, fn in actions_to_run.items():
-                try:
-                    net_result[name] = fn(net) if callable(fn) else fn
-                except Exception as e:
-                    logger.error(f"Error running action {name} for {net}: {e}", exc_info=True)
-                    net_result[name] = None
-
-            for a in requested:
-                if a not in actions and a not in ("all", "help"):
-                    net_result[a] = f"unsupported network action: {a}"
-
-            result[net] = net_result
+            for name in names:
+                if name in Actions.NETWORK_ACTIONS:
+                    submit = run_slow_io if name in Actions.SLOW_NETWORK_ACTIONS else run_on_threadpool
+                    live[name] = Actions._track((net, name), submit(Actions._run_network_action, net, name))
+                elif name in cached:
+                    store = cacher.get_list(net, name) if list_query else None
+                    net_result[name] = page(store, **list_query) if store is not None else snapshot.fragment(name)
+                else:
+                    net_result[name] = f"unsupported network action: {name}"
+            pending[net] = (snapshot, live, net_result)
+            result[net] = None # keep the requested network order
+
+        deadline = deadline or Actions.request_deadline()
+        for net, (snapshot, live, net_result) in pending.items():
+            live = {name: Actions._resolve_value(future, deadline, (net, name)) for name, future in live.items()}
+            if "all" in requested:
+                # Cached part is served straight from the pre-serialized snapshot
+                result[net] = snapshot.with_live(live) if snapshot else live
+            else:
+                result[net] = {name: live[name] if name in live else net_result[name] for name in requested}
 
         return result
@@ -0,0 +1,259 @@
+from abc import ABC, abstractmethod
+from datetime import date, datetime, time, timedelta
+from logconfig import logger
+from store import INVALID_TS, RewardList, first_before
+
+AGGREGATE_SCHEMA_VERSION = 2
+
+# Running totals over a newest-first history (one of the stores in store.py). Only the items
+# added since the last update are folded in, anything that doesn't line up with the stored
+# state triggers a full rebuild.
+class Aggregate(ABC):
+    KIND = None
+
+    def __init__(self, state=None):
+        self.reset()
+        if state:
+            self.load_state(state)
+
+    def reset(self):
+        self.count = 0
+        self.head = None
+        self.tail = None
+
+    def load_state(self, state):
+        if state.get("schema") != AGGREGATE_SCHEMA_VERSION or state.get("kind") != self.KIND:
+            logger.info(f"Stored {self.KIND} aggregate has an old schema, it will be rebuilt")
+            return
+        self.count = state.get("count", 0)
+        self.head = state.get("head")
+        self.tail = state.get("tail")
+
+    def to_state(self):
+        return {
+            "schema": AGGREGATE_SCHEMA_VERSION,
+            "kind": self.KIND,
+            "count": self.count,
+            "head": self.head,
+            "tail": self.tail,
+        }
+
+    def _delta(self, items):
+        # The stored head and tail must still sit where we left them, otherwise the history changed under us
+        new_count = len(items) - self.count
+        if not self.count or new_count < 0:
+            return None
+        if items.hash_at(new_count) != self.head or items.hash_at(-1) != self.tail:
+            return None
+        return items[:new_count]
+
+    def update(self, items):
+        delta = self._delta(items)
+        if delta is None:
+            logger.debug(f"Rebuilding {self.KIND} aggregate from {len(items)} items")
+            self.reset()
+            delta = items
+        self._apply(delta)
+        self.count = len(items)
+        self.head = items.hash_at(0) if items else None
+        self.tail = items.hash_at(-1) if items else None
+        return len(delta)
+
+    # Folds newest-first items into the totals
+    @abstractmethod
+    def _apply(self, items): ...
+
+    @staticmethod
+    def _date_key(ts):
+        try:
+            return date.fromisoformat(ts[:10]).isoformat()
+        except Exception:
+            return None
+
+    @staticmethod
+    def _today_and_yesterday():
+        now = datetime.now().astimezone()
+        return now.date().isoformat(), (now - timedelta(days=1)).date().isoformat()
+
+    @staticmethod
+    def _day_starts():
+        # Epoch seconds of local midnight for yesterday, today and tomorrow
+        today = datetime.now().date()
+        return tuple(
+            int(datetime.combine(today + timedelta(days=offset), time.min).timestamp())
+            for offset in (-1, 0, 1)
+        )
+
+class BlockAggregate(Aggregate):
+    KIND = "blocks"
+
+    def reset(self):
+        super().reset()
+        self.daily_counts = {}
+
+    def load_state(self, state):
+        super().load_state(state)
+        if self.count:
+            self.daily_counts = dict(state.get("daily_counts", {}))
+
+    def to_state(self):
+        state = super().to_state()
+        state["daily_counts"] = self.daily_counts
+        return state
+
+    def _apply(self, blocks):
+        for ts in blocks.timestamps:
+            if ts != INVALID_TS:
+                date_key = datetime.fromtimestamp(ts).date().isoformat()
+                self.daily_counts[date_key] = self.daily_counts.get(date_key, 0) + 1
+
+    def summary(self, blocks):
+        if not blocks:
+            return empty_blocks_summary()
+
+        yesterday_start, today_start, tomorrow_start = self._day_starts()
+        timestamps = blocks.timestamps
+        # Newest first, so today and yesterday are two runs right at the start
+        today_from = first_before(timestamps, tomorrow_start)
+        yesterday_from = first_before(timestamps, today_start, today_from)
+        yesterday_to = first_before(timestamps, yesterday_start, yesterday_from)
+        today_blocks = blocks[today_from:yesterday_from]
+        yesterday_blocks = blocks[yesterday_from:yesterday_to]
+
+        return {
+            "total": len(blocks),
+            "latest": blocks[0],
+            "earliest": blocks[-1],
+            "today": today_blocks,
+            "today_amount": len(today_blocks),
+            "yesterday": yesterday_blocks,
+            "yesterday_amount": len(yesterday_blocks),
+            "daily": blocks,
+            "daily_amount": len(blocks),
+            "daily_sums": [{"date": d, "block_count": v} for d, v in sorted(self.daily_counts.items())],
+        }
+
+class RewardAggregate(Aggregate):
+    KIND = "rewards"
+
+    def reset(self):
+        super().reset()
+        self.reward_txs = RewardList()
+        self.reward_count = 0
+        self.total_rewards = 0.0
+        self.daily_totals = {}
+        self.biggest = None
+        self.smallest = None
+
+    def load_state(self, state):
+        super().load_state(state)
+        if self.count:
+            self.reward_count = state.get("reward_count", 0)
+            self.total_rewards = state.get("total_rewards", 0.0)
+            self.daily_totals = dict(state.get("daily_totals", {}))
+            self.biggest = state.get("biggest")
+            self.smallest = state.get("smallest")
+
+    def to_state(self):
+        state = super().to_state()
+        state.update({
+            "reward_count": len(self.reward_txs),
+            "total_rewards": self.total_rewards,
+            "daily_totals": self.daily_totals,
+            "biggest": self.biggest,
+            "smallest": self.smallest,
+        })
+        return state
+
+    def attach_reward_txs(self, reward_txs):
+        # The reward list is stored with the cache, it has to match what the state was built from
+        if not self.count:
+            return
+        if reward_txs is None or len(reward_txs) != self.reward_count:
+            logger.info("Stored reward list doesn't match the rewards aggregate, it will be rebuilt")
+            self.reset()
+            return
+        self.reward_txs = reward_txs
+
+    @staticmethod
+    def _reward_entries(tx):
+        if tx.get("service") != "block_reward":
+            return []
+        return [
+            {
+                "tx_hash": tx.get("hash"),
+                "tx_created": tx.get("tx_created"),
+                "recv_coins": entry.get("recv_coins"),
+                "token": entry.get("token"),
+            }
+            for entry in tx.get("data", [])
+            if entry.get("tx_type") == "recv"
+        ]
+
+    def _apply(self, txs):
+        new_rewards = [reward for tx in txs for reward in self._reward_entries(tx)]
+
+        # Oldest first so that ties on biggest/smallest go to the newest reward
+        for reward_tx in reversed(new_rewards):
+            try:
+                reward_amount = float(reward_tx.get("recv_coins", 0))
+            except (TypeError, ValueError):
+                continue
+
+            self.total_rewards += reward_amount
+
+            if self.biggest is None or reward_amount >= float(self.biggest.get("recv_coins", 0)):
+                self.biggest = reward_tx
+            if self.smallest is None or reward_amount <= float(self.smallest.get("recv_coins", 0)):
+                self.smallest = reward_tx
+
+            tx_created = reward_tx.get("tx_created")
+            date_key = self._date_key(tx_created) if tx_created else None
+            if date_key:
+                self.daily_totals[date_key] = self.daily_totals.get(date_key, 0.0) + reward_amount
+
+        self.reward_txs = RewardList.from_dicts(new_rewards) + self.reward_txs
+
+    def summary(self):
+        if not self.count:
+            return empty_rewards_summary()
+
+        today_key, yesterday_key = self._today_and_yesterday()
+        return {
+            "total_rewards": self.total_rewards,
+            "latest_reward": self.reward_txs[0] if len(self.reward_txs) else None,
+            "earliest_reward": self.reward_txs[-1] if len(self.reward_txs) else None,
+            "daily": self.reward_txs,
+            "biggest": self.biggest,
+            "smallest": self.smallest,
+            "daily_sums": [{"date": d, "total_rewards": v} for d, v in sorted(self.daily_totals.items())],
+            "today": self.daily_totals.get(today_key, 0.0),
+            "yesterday": self.daily_totals.get(yesterday_key, 0.0),
+        }
+
+def empty_blocks_summary():
+    return {
+        "total": None,
+        "latest": None,
+        "earliest": None,
+        "today": None,
+        "today_amount": None,
+        "yesterday": None,
+        "yesterday_amount": None,
+        "daily": None,
+        "daily_amount": None,
+        "daily_sums": None,
+    }
+
+def empty_rewards_summary():
+    return {
+        "total_rewards": 0,
+        "latest_reward": None,
+        "earliest_reward": None,
+        "daily": [],
+        "biggest": None,
+        "smallest": None,
+        "daily_sums": [],
+        "today": 0,
+        "yesterday": 0,
+    }
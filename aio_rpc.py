@@ -0,0 +1,109 @@
+import asyncio, threading
+from exceptions import RequestError
+from logconfig import logger
+from config import Config
+from utils import utils
+import jsonlib
+
+# asyncio side of the node_cli socket, used by the cache refresh pipeline. All networks
+# share one event loop thread, blocking work goes to the background lane (threadpool.py).
+
+class EventLoopThread:
+    def __init__(self, name):
+        self.name = name
+        self._loop = None
+        self._lock = threading.Lock()
+
+    def _start(self):
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, daemon=True, name=self.name).start()
+                self._loop = loop
+        return self._loop
+
+    def run(self, coro, timeout=None):
+        # Runs the coroutine on the loop thread and waits for it, cancelling it on timeout
+        loop = self._start()
+        if timeout is not None:
+            coro = asyncio.wait_for(coro, timeout)
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+class AsyncUnixRpcClient:
+    def __init__(self, socket_path, path="/connect", timeout=15):
+        self.socket_path = socket_path
+        self.path = path
+        self.timeout = timeout
+
+    async def call(self, method, subcommand, arguments=None, timeout=None):
+        body = jsonlib.dumps_bytes(utils._build_request(method, subcommand, arguments))
+        return await asyncio.wait_for(self._post(body), timeout or self.timeout)
+
+    async def call_many(self, calls, timeout=None):
+        # Same contract as Utils.send_batch: results in order, failed calls get an error object.
+        # Raises if every call failed, that's the socket and not the calls.
+        calls = list(calls)
+        results = await asyncio.gather(
+            *(self.call(method, subcommand, arguments, timeout) for method, subcommand, arguments in calls),
+            return_exceptions=True,
+        )
+        errors = [result for result in results if isinstance(result, BaseException)]
+        for error in errors:
+            if isinstance(error, asyncio.CancelledError):
+                raise error
+        if calls and len(errors) == len(calls):
+            raise RequestError(f"All {len(calls)} node_cli calls failed, first error: {errors[0]!r}")
+        for i, ((method, subcommand, _), result) in enumerate(zip(calls, results)):
+            if isinstance(result, BaseException):
+                logger.warning(f"Async {method} {subcommand} failed: {result!r}")
+                results[i] = {"error": {"message": f"{method} {subcommand} failed"}}
+        return results
+
+    async def _post(self, body):
+        reader, writer = await asyncio.open_unix_connection(self.socket_path)
+        try:
+            writer.write(
+                f"POST {self.path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+
+            status_line = await reader.readline()
+            parts = status_line.split()
+            if len(parts) < 2 or not parts[1].isdigit():
+                raise RequestError(f"Malformed status line from node_cli: {status_line!r}")
+            status = int(parts[1])
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                key, _, value = line.decode("latin-1").partition(":")
+                headers[key.strip().lower()] = value.strip()
+
+            if "content-length" in headers:
+                data = await reader.readexactly(int(headers["content-length"]))
+            elif headers.get("transfer-encoding", "").lower() == "chunked":
+                data = await self._read_chunked(reader)
+            else:
+                data = await reader.read()
+        finally:
+            writer.close()
+
+        if status >= 400:
+            raise RequestError(f"node_cli returned HTTP {status}")
+        return jsonlib.loads(data)
+
+    @staticmethod
+    async def _read_chunked(reader):
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b";")[0].strip(), 16)
+            if not size:
+                await reader.readline()
+                return b"".join(chunks)
+            chunks.append(await reader.readexactly(size))
+            await reader.readline()
+
+event_loop = EventLoopThread("cacher-loop")
+aio_rpc = AsyncUnixRpcClient("/opt/cellframe-node/var/run/node_cli", timeout=Config.RPC_TIMEOUT)
@@ -1,47 +1,192 @@
 from logconfig import logger
 from masternode_helpers import masternode_helpers
-from threadpool import run_on_threadpool
+from threadpool import run_in_background, run_in_background_from_loop
 from utils import utils
 from config import Config
 from parsers import Parsers as P
-from DAP.GlobalDB import DB as GlobalDB
+from snapshot import Snapshot
+from store import BlockList, RewardList, TxHistory
+from aggregates import BlockAggregate, RewardAggregate, empty_blocks_summary, empty_rewards_summary
+from gdb_store import gdb_store
+from aio_rpc import aio_rpc, event_loop
+from stages import Stage, StageRunner
 from datetime import datetime
-import jsonlib
-import time
-
-GDB_GROUP = "local.mninspectorcache"
+import functools, threading, time
+
+TX_HISTORY_PAGE_SIZE = 100
+TX_HISTORY_MAX_INCREMENTAL_PAGES = 20 # more new transactions than this and we just refetch everything
+PROBE_TX_LIMIT = 5 # newest wallet txs the probe looks through for the newest accepted one
+BLOCK_LIST_KEYS = (
+    "first_signed_blocks_daily", "first_signed_blocks_today", "first_signed_blocks_yesterday",
+    "signed_blocks_daily", "signed_blocks_today", "signed_blocks_yesterday",
+)
+REWARD_LIST_KEYS = ("reward_wallet_daily_rewards", "sovereign_wallet_daily_rewards")
+REWARD_AGGREGATE_KEYS = {"rewards": "reward_wallet_daily_rewards", "sovereign_rewards": "sovereign_wallet_daily_rewards"}
 
 class Cacher:
+    REFRESH_INTERVAL = 60 # seconds, used until we know the block rate of a network
+    MIN_REFRESH_INTERVAL = 15
+    MAX_REFRESH_INTERVAL = 900
+    REFRESH_TIMEOUT = 300 # one refresh, its stages are cancelled after this
+
     def __init__(self):
         logger.debug("Initializing Cacher...")
         self.cache = {}
-        for network in masternode_helpers._active_networks_config:
-                old_cache = self._gdb_load(network)
+        # Stored caches are loaded in the background (or on first read), not while the node waits for init()
+        self.cache_state = {network: "pending" for network in masternode_helpers._active_networks_config}
+        self._hydrate_locks = {network: threading.Lock() for network in masternode_helpers._active_networks_config}
+        self.schedule = {network: {"failures": 0} for network in masternode_helpers._active_networks_config}
+        self.rewards = {}
+        self.sovereign_rewards = {}
+        self.snapshots = {}
+        self.tx_histories = {}
+        self.aggregates = {}
+        self.stage_runners = {network: StageRunner(network, run_in_background_from_loop) for network in masternode_helpers._active_networks_config}
+
+    def _hydrate(self, network):
+        lock = self._hydrate_locks.get(network)
+        if not lock or self.cache_state.get(network) not in ("pending", "loading"):
+            return
+        # A reader arriving while another thread loads waits here until the cache is in
+        with lock:
+            if self.cache_state.get(network) != "pending":
+                return
+            self.cache_state[network] = "loading"
+            try:
+                old_cache = gdb_store.load_cache(network)
                 if old_cache:
-                    self.cache[network] = old_cache
+                    self.cache[network] = self._compact(old_cache)
                     logger.info(f"Loaded cache for {network} from GDB")
                     logger.info(f"Cache was updated at {old_cache.get('cache_last_updated', 'unknown time')}")
                 else:
                     logger.info(f"No cache found for {network} in GDB, starting fresh")
-        self.rewards = {}
-        self.sovereign_rewards = {}
+            except Exception as e:
+                logger.error(f"Failed to load cache for {network}: {e}", exc_info=True)
+            self.cache_state[network] = "ready" if self.cache.get(network) else "empty"
+
+    def hydrate(self):
+        futures = [run_in_background(self._hydrate, network) for network in self._hydrate_locks]
+        for future in futures:
+            if future:
+                future.result()
+
+    def get_cache_status(self):
+        return {
+            network: {
+                "state": state,
+                "cache_last_updated": self.cache.get(network, {}).get("cache_last_updated"),
+                "last_refresh_outcome": self.schedule.get(network, {}).get("last_outcome"),
+                "next_refresh_in": self._next_refresh_in(network),
+                "last_refresh_stages": self.stage_runners[network].last_run,
+            }
+            for network, state in self.cache_state.items()
+        }
+
+    def _next_refresh_in(self, network):
+        next_run = self.schedule.get(network, {}).get("next_run")
+        return max(0, round(next_run - time.time())) if next_run else None
 
-    def _gdb_save(self, network, data):
+    @staticmethod
+    def _compact(data):
+        # GDB hands back plain lists, move the big ones into compact stores
+        for key in BLOCK_LIST_KEYS:
+            if isinstance(data.get(key), list):
+                data[key] = BlockList.from_dicts(data[key])
+        for key in REWARD_LIST_KEYS:
+            if isinstance(data.get(key), list):
+                data[key] = RewardList.from_dicts(data[key])
+        return data
+
+    def _get_aggregate(self, network, name, aggregate_cls):
+        if network not in self.aggregates:
+            self.aggregates[network] = {}
+            for stored_name, state in gdb_store.load_aggregates(network).items():
+                if state.get("kind") == BlockAggregate.KIND:
+                    self.aggregates[network][stored_name] = BlockAggregate(state)
+                else:
+                    # Reward list itself is persisted with the cache, not with the aggregate
+                    aggregate = RewardAggregate(state)
+                    aggregate.attach_reward_txs(self.cache.get(network, {}).get(REWARD_AGGREGATE_KEYS.get(stored_name)))
+                    self.aggregates[network][stored_name] = aggregate
+        aggregate = self.aggregates[network].get(name)
+        if not isinstance(aggregate, aggregate_cls):
+            aggregate = self.aggregates[network][name] = aggregate_cls()
+        return aggregate
+
+    def _summarize_blocks(self, network, name, blocks):
+        aggregate = self._get_aggregate(network, name, BlockAggregate)
         try:
-            if not GlobalDB.set(network, GDB_GROUP, jsonlib.dumps_bytes(data)):
-                logger.warning(f"GDB write failed for {network}")
+            added = aggregate.update(blocks)
+            logger.debug(f"{network}: folded {added} new items into {name} aggregate")
+            return aggregate.summary(blocks)
         except Exception as e:
-            logger.error(f"Failed to save cache to GDB for {network}: {e}", exc_info=True)
+            logger.error(f"Error aggregating {name} for {network}: {e}", exc_info=True)
+            aggregate.reset()
+            return empty_blocks_summary()
 
-    def _gdb_load(self, network):
+    def _summarize_rewards(self, network, name, tx_history):
+        aggregate = self._get_aggregate(network, name, RewardAggregate)
         try:
-            raw = GlobalDB.get(network, GDB_GROUP)
-            if raw:
-                return jsonlib.loads(raw)
+            added = aggregate.update(tx_history)
+            logger.debug(f"{network}: folded {added} new items into {name} aggregate")
+            return aggregate.summary()
         except Exception as e:
-            logger.error(f"Failed to load cache from GDB for {network}: {e}", exc_info=True)
+            logger.error(f"Error aggregating {name} for {network}: {e}", exc_info=True)
+            aggregate.reset()
+            return empty_rewards_summary()
+
+    def _fetch_new_transactions(self, network, address, watermark):
+        # History comes newest first, page through it until we meet the newest tx we already have
+        new_txs = []
+        for page_num in range(TX_HISTORY_MAX_INCREMENTAL_PAGES):
+            page = masternode_helpers.get_tx_history(
+                network, address, limit=TX_HISTORY_PAGE_SIZE, offset=page_num * TX_HISTORY_PAGE_SIZE
+            )
+            if not page:
+                return None
+            for tx in page:
+                if tx.get("hash") == watermark:
+                    return new_txs
+                new_txs.append(tx)
+            if len(page) < TX_HISTORY_PAGE_SIZE:
+                return None # reached the end without finding the watermark
         return None
 
+    def _get_tx_history(self, network, address):
+        key = (network, address)
+        stored = self.tx_histories.get(key) or gdb_store.load_tx_history(network, address)
+        watermark = (stored or {}).get("watermark") or {}
+
+        history = None
+        if stored and watermark.get("hash"):
+            new_txs = self._fetch_new_transactions(network, address, watermark["hash"])
+            if new_txs is None:
+                logger.info(f"Watermark for {address} on {network} not found, fetching full tx history")
+            else:
+                new_txs = TxHistory.from_dicts(P.replace_timestamps(new_txs) if new_txs else [])
+                history = new_txs + stored["history"]
+                logger.info(f"Fetched {len(new_txs)} new transactions for {address} on {network}")
+
+        full_fetch = history is None
+        if full_fetch:
+            raw_tx = masternode_helpers.get_tx_history(network, address)
+            if not raw_tx:
+                return stored["history"] if stored else []
+            history = TxHistory.from_dicts(P.replace_timestamps(raw_tx))
+
+        if not history:
+            return []
+
+        newest = history[0]
+        data = {
+            "watermark": {"hash": history.hash_at(0), "tx_created": newest.get("tx_created")},
+            "history": history,
+        }
+        self.tx_histories[key] = data
+        if not stored or watermark.get("hash") != history.hash_at(0):
+            gdb_store.save_tx_history(network, address, data, rewrite=full_fetch)
+        return history
+
     def _get_incremental_date(self, network, cache_key):
         blocks = self.cache.get(network, {}).get(cache_key)
         if blocks and len(blocks) > 0:
@@ -57,22 +202,10 @@ class Cacher:
 
     @staticmethod
     def _merge_blocks(existing, new_blocks):
-        if not existing or not isinstance(existing, list):
-            return new_blocks
-        seen = {b["hash"] for b in existing if isinstance(b, dict) and "hash" in b}
-        if not seen:
-            return new_blocks
-        merged = list(existing)
-        added = 0
-        for b in new_blocks:
-            h = b.get("hash")
-            if h and h not in seen:
-                merged.append(b)
-                seen.add(h)
-                added += 1
-        if added:
-            merged.sort(key=lambda b: b.get("ts_create", ""), reverse=True)
-            logger.info(f"Merged {added} new blocks with {len(existing)} cached blocks")
+        if not existing or not isinstance(existing, BlockList):
+            return BlockList.from_dicts(new_blocks).sort_newest_first()
+        merged = existing.merge(new_blocks)
+        logger.info(f"Merged {len(merged) - len(existing)} new blocks with {len(existing)} cached blocks")
         return merged
 
     def cache_everything(self):
@@ -80,256 +213,389 @@ class Cacher:
             if not masternode_helpers._active_networks_config:
                 logger.warning("No active networks configured, caching will not start")
                 return
-            while True:
-                for network in masternode_helpers._active_networks_config:
-                    start_time = time.time()
-
-                    # Wait until node is synced, there's no point in caching if node is not synced
-                    if not masternode_helpers.get_network_status(network).get("synced"):
-                        logger.info(f"{network} not synced, skipping this cycle")
-                        continue
-
-                    current_blocks_on_network = masternode_helpers.get_block_count(network)
-                    old_blocks_on_network = self.cache.get(network, {}).get("block_count", 0)
-
-                    block_diff = current_blocks_on_network - old_blocks_on_network
-
-                    last_updated_iso = self.cache.get(network, {}).get("cache_last_updated", None)
-                    force_refresh = False
-
-                    if last_updated_iso:
-                        try:
-                            last_updated_dt = datetime.fromisoformat(last_updated_iso)
-                            elapsed = time.time() - last_updated_dt.timestamp()
-                            if elapsed >= Config.FORCE_CACHE_REFRESH_INTERVAL:
-                                force_refresh = True
-                        except Exception:
-                            pass
-
-                    if block_diff < Config.BLOCK_COUNT_THRESHOLD and not force_refresh:
-                        logger.info(
-                            f"{network}: Block count diff {block_diff} < {Config.BLOCK_COUNT_THRESHOLD} "
-                            f"and last cache update {elapsed:.0f}s ago < {Config.FORCE_CACHE_REFRESH_INTERVAL}s — skipping this cycle."
-                        )
-                        continue
-
-                    if force_refresh:
-                        if block_diff <= 0:
-                            logger.info(f"Force refresh was triggered, but block diff between cache "
-                                        f"and network is {block_diff}, skipping cache refresh.")
-                            continue
-                        else:
-                            logger.info(
-                                f"{network}: Forcing cache refresh (last updated {elapsed:.0f}s ago, "
-                                f"interval {Config.FORCE_CACHE_REFRESH_INTERVAL}s, block diff is {block_diff})"
-                            )
-
-
-                    logger.info(f"Caching data for {network}...")
-
-                    node_info = masternode_helpers.get_node_info(network) or {}
-                    sovereign_addr = node_info.get("sovereign_reward_wallet_address", None)
-
-                    signed_from_date = self._get_incremental_date(network, "signed_blocks_daily")
-                    fsb_from_date = self._get_incremental_date(network, "first_signed_blocks_daily")
-
-                    # Async fetch all raw data first
-                    futures = {
-                        "block_count_today": run_on_threadpool(masternode_helpers.get_blocks_on_network_today, network),
-                        "first_signed_blocks_raw": run_on_threadpool(masternode_helpers.get_signed_blocks, network, first_signed=True, from_date=fsb_from_date),
-                        "signed_blocks_raw": run_on_threadpool(masternode_helpers.get_signed_blocks, network, from_date=signed_from_date),
-                        "tx_history_raw": run_on_threadpool(
-                            masternode_helpers.get_tx_history,
-                            network,
-                            masternode_helpers._active_networks_config[network]["wallet"],
-                        ),
-                        "current_block_reward": run_on_threadpool(masternode_helpers.get_current_block_reward, network),
-                        "chain_size": run_on_threadpool(masternode_helpers.get_chain_size, network),
-                    }
-
-                    if sovereign_addr:
-                        futures["sovereign_tx_history_raw"] = run_on_threadpool(
-                            masternode_helpers.get_tx_history, network, sovereign_addr
-                        )
-
-                    # ----------------------------------------------------------------
-                    # Pre-parse only if we have data
-                    # ----------------------------------------------------------------
-                    first_signed_blocks = []
-                    signed_blocks = []
-                    tx_history = []
-                    sovereign_tx_history = None
-
-                    raw_fsb = futures["first_signed_blocks_raw"].result() if futures["first_signed_blocks_raw"] else None
-                    if raw_fsb:
-                        new_fsb = P.replace_timestamps(raw_fsb, blocks=True)
-                        existing_fsb = self.cache.get(network, {}).get("first_signed_blocks_daily") or []
-                        first_signed_blocks = self._merge_blocks(existing_fsb, new_fsb) if fsb_from_date else new_fsb
-
-                    raw_sb = futures["signed_blocks_raw"].result() if futures["signed_blocks_raw"] else None
-                    if raw_sb:
-                        new_sb = P.replace_timestamps(raw_sb, blocks=True)
-                        existing_sb = self.cache.get(network, {}).get("signed_blocks_daily") or []
-                        signed_blocks = self._merge_blocks(existing_sb, new_sb) if signed_from_date else new_sb
-
-                    raw_tx = futures["tx_history_raw"].result() if futures["tx_history_raw"] else None
-                    if raw_tx:
-                        tx_history = P.replace_timestamps(raw_tx)
-
-                    if "sovereign_tx_history_raw" in futures:
-                        raw_sovereign_tx = futures["sovereign_tx_history_raw"].result()
-                        if raw_sovereign_tx:
-                            sovereign_tx_history = P.replace_timestamps(raw_sovereign_tx)
-
-                    # ----------------------------------------------------------------
-                    # Blocks
-                    # ----------------------------------------------------------------
-                    fsb_total = fsb_latest = fsb_earliest = None
-                    fsb_today = fsb_today_amount = None
-                    fsb_yesterday = fsb_yesterday_amount = None
-                    fsb_daily = fsb_daily_amount = None
-                    fsb_daily_sums = None
-
-                    if first_signed_blocks:
-                        fsb_snapshot = run_on_threadpool(P.parse_blocks_data, first_signed_blocks).result()
-                        fsb_total = fsb_snapshot.get("total")
-                        fsb_latest = fsb_snapshot.get("latest")
-                        fsb_earliest = fsb_snapshot.get("earliest")
-                        fsb_today = fsb_snapshot.get("today")
-                        fsb_today_amount = fsb_snapshot.get("today_amount")
-                        fsb_yesterday = fsb_snapshot.get("yesterday")
-                        fsb_yesterday_amount = fsb_snapshot.get("yesterday_amount")
-                        fsb_daily = fsb_snapshot.get("daily")
-                        fsb_daily_amount = fsb_snapshot.get("daily_amount")
-                        fsb_daily_sums = fsb_snapshot.get("daily_sums")
-
-                    sb_total = sb_latest = sb_earliest = None
-                    sb_today = sb_today_amount = None
-                    sb_yesterday = sb_yesterday_amount = None
-                    sb_daily = sb_daily_amount = None
-                    sb_daily_sums = None
-
-                    if signed_blocks:
-                        sb_snapshot = run_on_threadpool(P.parse_blocks_data, signed_blocks).result()
-                        sb_total = sb_snapshot.get("total")
-                        sb_latest = sb_snapshot.get("latest")
-                        sb_earliest = sb_snapshot.get("earliest")
-                        sb_today = sb_snapshot.get("today")
-                        sb_today_amount = sb_snapshot.get("today_amount")
-                        sb_yesterday = sb_snapshot.get("yesterday")
-                        sb_yesterday_amount = sb_snapshot.get("yesterday_amount")
-                        sb_daily = sb_snapshot.get("daily")
-                        sb_daily_amount = sb_snapshot.get("daily_amount")
-                        sb_daily_sums = sb_snapshot.get("daily_sums")
-
-                    # ----------------------------------------------------------------
-                    # Rewards
-                    # ----------------------------------------------------------------
-                    tx_total_rewards = tx_latest_reward = tx_earliest_reward = None
-                    tx_daily_rewards = tx_smallest_reward = tx_biggest_reward = tx_daily_sums = None
-                    tx_today_rewards = tx_yesterday_rewards = None
-                    sovereign_tx_total_rewards = sovereign_tx_latest_reward = sovereign_tx_earliest_reward = sovereign_tx_daily_rewards = None
-                    sovereign_tx_smallest_reward = sovereign_tx_biggest_reward = sovereign_tx_daily_sums = None
-                    sovereign_tx_today_rewards = sovereign_tx_yesterday_rewards = None
-
-                    if tx_history:
-                        self.rewards[network] = tx_history
-                        tx_snapshot = run_on_threadpool(P.parse_tx_data, tx_history).result()
-                        tx_total_rewards = tx_snapshot.get("total_rewards")
-                        tx_latest_reward = tx_snapshot.get("latest_reward")
-                        tx_earliest_reward = tx_snapshot.get("earliest_reward")
-                        tx_daily_rewards = tx_snapshot.get("daily")
-                        tx_biggest_reward = tx_snapshot.get("biggest")
-                        tx_smallest_reward = tx_snapshot.get("smallest")
-                        tx_daily_sums = tx_snapshot.get("daily_sums")
-                        tx_today_rewards = tx_snapshot.get("today")
-                        tx_yesterday_rewards = tx_snapshot.get("yesterday")
-
-                    if sovereign_tx_history:
-                        self.sovereign_rewards[network] = sovereign_tx_history
-                        sovereign_tx_snapshot = run_on_threadpool(P.parse_tx_data, sovereign_tx_history).result()
-                        sovereign_tx_total_rewards = sovereign_tx_snapshot.get("total_rewards")
-                        sovereign_tx_latest_reward = sovereign_tx_snapshot.get("latest_reward")
-                        sovereign_tx_earliest_reward = sovereign_tx_snapshot.get("earliest_reward")
-                        sovereign_tx_daily_rewards = sovereign_tx_snapshot.get("daily")
-                        sovereign_tx_smallest_reward = sovereign_tx_snapshot.get("smallest")
-                        sovereign_tx_biggest_reward = sovereign_tx_snapshot.get("biggest")
-                        sovereign_tx_daily_sums = sovereign_tx_snapshot.get("daily_sums")
-                        sovereign_tx_today_rewards = sovereign_tx_snapshot.get("today")
-                        sovereign_tx_yesterday_rewards = sovereign_tx_snapshot.get("yesterday")
-
-                    # ----------------------------------------------------------------
-                    # Build cache
-                    # ----------------------------------------------------------------
-                    new_data = {
-                        "block_count_today": futures["block_count_today"].result(),
-                        "block_count": current_blocks_on_network,
-                        "chain_size": futures["chain_size"].result(),
-                        "current_block_reward": futures["current_block_reward"].result(),
-                        "first_signed_blocks_count": fsb_total,
-                        "first_signed_blocks_daily_amount": fsb_daily_amount,
-                        "first_signed_blocks_daily": fsb_daily,
-                        "first_signed_blocks_all_sums_daily": fsb_daily_sums,
-                        "first_signed_blocks_earliest": fsb_earliest,
-                        "first_signed_blocks_latest": fsb_latest,
-                        "first_signed_blocks_today_amount": fsb_today_amount,
-                        "first_signed_blocks_today": fsb_today,
-                        "first_signed_blocks_yesterday_amount": fsb_yesterday_amount,
-                        "first_signed_blocks_yesterday": fsb_yesterday,
-                        "native_ticker": masternode_helpers._active_networks_config[network].get('native_ticker'),
-                        "signed_blocks_count": sb_total,
-                        "signed_blocks_daily_amount": sb_daily_amount,
-                        "signed_blocks_daily": sb_daily,
-                        "signed_blocks_all_sums_daily": sb_daily_sums,
-                        "signed_blocks_earliest": sb_earliest,
-                        "signed_blocks_latest": sb_latest,
-                        "signed_blocks_today_amount": sb_today_amount,
-                        "signed_blocks_today": sb_today,
-                        "signed_blocks_yesterday_amount": sb_yesterday_amount,
-                        "signed_blocks_yesterday": sb_yesterday,
-                        "reward_wallet_biggest_reward": tx_biggest_reward,
-                        "reward_wallet_daily_rewards": tx_daily_rewards,
-                        "reward_wallet_all_sums_daily": tx_daily_sums,
-                        "reward_wallet_earliest_reward": tx_earliest_reward,
-                        "reward_wallet_latest_reward": tx_latest_reward,
-                        "reward_wallet_today_rewards": tx_today_rewards,
-                        "reward_wallet_yesterday_rewards": tx_yesterday_rewards,
-                        "reward_wallet_smallest_reward": tx_smallest_reward,
-                        "reward_wallet_total_rewards": tx_total_rewards,
-                    }
-
-                    if sovereign_tx_history:
-                        new_data.update(
-                            {
-                                "sovereign_wallet_biggest_reward": sovereign_tx_biggest_reward,
-                                "sovereign_wallet_daily_rewards": sovereign_tx_daily_rewards,
-                                "sovereign_wallet_all_sums_daily": sovereign_tx_daily_sums,
-                                "sovereign_wallet_earliest_reward": sovereign_tx_earliest_reward,
-                                "sovereign_wallet_latest_reward": sovereign_tx_latest_reward,
-                                "sovereign_wallet_today_rewards": sovereign_tx_today_rewards,
-                                "sovereign_wallet_yesterday_rewards": sovereign_tx_yesterday_rewards,
-                                "sovereign_wallet_smallest_reward": sovereign_tx_smallest_reward,
-                                "sovereign_wallet_total_rewards": sovereign_tx_total_rewards,
-                            }
-                        )
-
-                    new_data["cache_last_updated"] = utils.now_iso()
-
-                    if node_info:
-                        new_data.update(node_info)
-                    self.cache[network] = new_data
-                    self._gdb_save(network, new_data)
-
-                    logger.info(
-                        f"Cached data for {network} in {time.time() - start_time:.2f} seconds "
-                        f"(memory + GDB updated)"
-                    )
-                time.sleep(60) # Magic number 60 might be just enough
-                # And boom! We have a cache!
+            self.hydrate()
+            # One independent refresh loop per network, a slow network doesn't hold back the others
+            threads = [
+                threading.Thread(target=self._refresh_loop, args=(network,), daemon=True, name=f"cacher-{network}")
+                for network in masternode_helpers._active_networks_config
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
         except Exception as e:
             logger.error(f"An error occurred in the caching loop: {e}", exc_info=True)
 
+    def _refresh_loop(self, network):
+        schedule = self.schedule[network]
+        triggered = False
+        while True:
+            started = time.time()
+            try:
+                outcome, block_count = self.refresh_network(network, triggered=triggered)
+                schedule["failures"] = 0
+            except Exception as e:
+                logger.error(f"An error occurred while caching {network}: {e}", exc_info=True)
+                outcome, block_count = "error", None
+                schedule["failures"] += 1
+            duration = time.time() - started
+
+            delay = self._next_delay(network, outcome, block_count, started, duration)
+            schedule.update({
+                "last_outcome": outcome,
+                "last_duration": round(duration, 2),
+                "next_run": time.time() + delay,
+            })
+            logger.debug(f"{network}: {outcome} in {duration:.2f}s, next run in {delay:.0f}s")
+            triggered = self._wait_for_changes(network, delay)
+
+    def _wait_for_changes(self, network, delay):
+        # Sleeps until the next scheduled run, probing for our own new blocks and rewards meanwhile.
+        # Returns True when the probe saw something new and the refresh should run right away.
+        # No probing while backing off after errors, the cache lags the node until a refresh works.
+        if Config.PROBE_INTERVAL <= 0 or self.schedule[network]["failures"]:
+            time.sleep(delay)
+            return False
+        wake_at = time.time() + delay
+        while True:
+            remaining = wake_at - time.time()
+            if remaining <= 0:
+                return False
+            time.sleep(min(Config.PROBE_INTERVAL, remaining))
+            if time.time() < wake_at and self._probe(network):
+                return True
+
+    def _probe(self, network):
+        # Cheap watermark check: today's blocks signed by us and the newest reward wallet tx
+        cached = self.cache.get(network)
+        if not cached:
+            return False
+        try:
+            today = utils.current_time_in_format("%y%m%d")
+            blocks = masternode_helpers.get_signed_blocks(network, from_date=today)
+            # Cached list is newest first, anything we already have from today is at its very start
+            known = cached.get("signed_blocks_daily")
+            known_hashes = set(known.hashes[:len(blocks)]) if isinstance(known, BlockList) else set()
+            for block in blocks:
+                if block.get("hash") not in known_hashes:
+                    logger.info(f"{network}: new signed block {block.get('hash')}, refreshing cache")
+                    return True
+
+            address = masternode_helpers._active_networks_config[network]["wallet"]
+            watermark = (self.tx_histories.get((network, address)) or {}).get("watermark") or {}
+            # The watermark is the newest accepted tx, pending and declined ones on top don't count
+            recent = masternode_helpers.get_tx_history(network, address, limit=PROBE_TX_LIMIT)
+            newest = next((tx for tx in recent or [] if tx.get("status") == "ACCEPTED"), None)
+            if newest and watermark.get("hash") and newest.get("hash") != watermark["hash"]:
+                logger.info(f"{network}: new transaction {newest.get('hash')} on reward wallet, refreshing cache")
+                return True
+        except Exception as e:
+            logger.error(f"Watermark probe failed for {network}: {e}", exc_info=True)
+        return False
+
+    def _next_delay(self, network, outcome, block_count, started, duration):
+        schedule = self.schedule[network]
+
+        # Smoothed block rate from the block counts we have seen
+        if block_count is not None:
+            last_count, last_time = schedule.get("last_block_count"), schedule.get("last_block_time")
+            if last_count is not None and block_count >= last_count and started > last_time:
+                rate = (block_count - last_count) / (started - last_time)
+                old_rate = schedule.get("block_rate")
+                schedule["block_rate"] = rate if old_rate is None else 0.7 * old_rate + 0.3 * rate
+            schedule["last_block_count"], schedule["last_block_time"] = block_count, started
+
+        if outcome == "error":
+            return min(self.REFRESH_INTERVAL * 2 ** schedule["failures"], self.MAX_REFRESH_INTERVAL)
+        if outcome == "not_synced":
+            return self.REFRESH_INTERVAL
+
+        delay = self.REFRESH_INTERVAL
+        rate = schedule.get("block_rate")
+        if rate:
+            # Come back about when enough new blocks should be there to pass the threshold
+            cached_count = self.cache.get(network, {}).get("block_count", 0)
+            missing = max(Config.BLOCK_COUNT_THRESHOLD - (block_count - cached_count), 1)
+            delay = missing / rate
+
+        # A slow refresh gets at least as much idle time as it took
+        delay = max(delay, duration)
+
+        # Don't sleep past the forced refresh
+        last_updated = self.cache.get(network, {}).get("cache_last_updated")
+        if last_updated:
+            try:
+                until_forced = Config.FORCE_CACHE_REFRESH_INTERVAL - (time.time() - datetime.fromisoformat(last_updated).timestamp())
+                delay = min(delay, max(until_forced, self.MIN_REFRESH_INTERVAL))
+            except Exception:
+                pass
+
+        return min(max(delay, self.MIN_REFRESH_INTERVAL), self.MAX_REFRESH_INTERVAL)
+
+    def refresh_network(self, network, triggered=False):
+        # triggered: the watermark probe saw a new block or reward of ours, refresh regardless of the block count
+        start_time = time.time()
+        elapsed = 0
+
+        # Wait until node is synced, there's no point in caching if node is not synced
+        network_status, current_blocks_on_network = masternode_helpers.get_sync_and_block_count(network)
+        if not (network_status or {}).get("synced"):
+            logger.info(f"{network} not synced, skipping this cycle")
+            return "not_synced", None
+
+        old_blocks_on_network = self.cache.get(network, {}).get("block_count", 0)
+
+        block_diff = current_blocks_on_network - old_blocks_on_network
+
+        last_updated_iso = self.cache.get(network, {}).get("cache_last_updated", None)
+        force_refresh = False
+
+        if last_updated_iso:
+            try:
+                last_updated_dt = datetime.fromisoformat(last_updated_iso)
+                elapsed = time.time() - last_updated_dt.timestamp()
+                if elapsed >= Config.FORCE_CACHE_REFRESH_INTERVAL:
+                    force_refresh = True
+            except Exception:
+                pass
+
+        if triggered:
+            logger.info(f"{network}: Refreshing cache for new own blocks or rewards (block diff is {block_diff})")
+        elif block_diff < Config.BLOCK_COUNT_THRESHOLD and not force_refresh:
+            logger.info(
+                f"{network}: Block count diff {block_diff} < {Config.BLOCK_COUNT_THRESHOLD} "
+                f"and last cache update {elapsed:.0f}s ago < {Config.FORCE_CACHE_REFRESH_INTERVAL}s — skipping this cycle."
+            )
+            return "skipped", current_blocks_on_network
+        elif force_refresh:
+            if block_diff <= 0:
+                logger.info(f"Force refresh was triggered, but block diff between cache "
+                            f"and network is {block_diff}, skipping cache refresh.")
+                return "skipped", current_blocks_on_network
+            else:
+                logger.info(
+                    f"{network}: Forcing cache refresh (last updated {elapsed:.0f}s ago, "
+                    f"interval {Config.FORCE_CACHE_REFRESH_INTERVAL}s, block diff is {block_diff})"
+                )
+
+
+        logger.info(f"Caching data for {network}...")
+
+        runner = self.stage_runners[network]
+        event_loop.run(runner.run(self._refresh_stages(network, current_blocks_on_network)), timeout=self.REFRESH_TIMEOUT)
+
+        logger.info(
+            f"Cached data for {network} in {time.time() - start_time:.2f} seconds "
+            f"(memory + GDB updated), slowest stages: {runner.slowest()}"
+        )
+        return "refreshed", current_blocks_on_network
+
+    def _refresh_stages(self, network, block_count):
+        # One refresh as a stage graph, each stage gets the outputs of the stages it names
+        wallet = masternode_helpers._active_networks_config[network]["wallet"]
+        signed_from_date = self._get_incremental_date(network, "signed_blocks_daily")
+        fsb_from_date = self._get_incremental_date(network, "first_signed_blocks_daily")
+        today = datetime.now().date()
+
+        def summary_key(store):
+            # Summaries only change with the store and with the day (today / yesterday)
+            return (len(store), store.hash_at(0) if store else None, today)
+
+        return [
+            Stage("node_calls", lambda: masternode_helpers.cycle_data_calls(network, signed_from_date, fsb_from_date)),
+            Stage("cycle_data", functools.partial(self._fetch_cycle_data, network), ["node_calls"]),
+            Stage("tx_history", lambda: self._get_tx_history(network, wallet) or []),
+            Stage("current_block_reward", lambda: masternode_helpers.get_current_block_reward(network)),
+            Stage("chain_size", lambda: masternode_helpers.get_chain_size(network)),
+            # Sovereign rewards are paid by the same collect txs as ours, as long as the address
+            # is the same and our wallet has no new tx there is nothing new to fetch
+            Stage(
+                "sovereign_tx_history",
+                lambda cycle_data, tx_history: self._get_sovereign_tx_history(network, cycle_data),
+                ["cycle_data", "tx_history"],
+                key=lambda cycle_data, tx_history: (
+                    self._sovereign_addr(cycle_data), tx_history.hash_at(0) if tx_history else None
+                ),
+            ),
+            Stage(
+                "first_signed_blocks",
+                lambda cycle_data: self._merge_new_blocks(network, "first_signed_blocks_daily", fsb_from_date, cycle_data.get("first_signed_blocks")),
+                ["cycle_data"],
+            ),
+            Stage(
+                "signed_blocks",
+                lambda cycle_data: self._merge_new_blocks(network, "signed_blocks_daily", signed_from_date, cycle_data.get("signed_blocks")),
+                ["cycle_data"],
+            ),
+            Stage(
+                "first_signed_blocks_summary",
+                lambda blocks: self._summarize_blocks(network, "first_signed_blocks", blocks) if blocks else {},
+                ["first_signed_blocks"],
+                key=summary_key,
+            ),
+            Stage(
+                "signed_blocks_summary",
+                lambda blocks: self._summarize_blocks(network, "signed_blocks", blocks) if blocks else {},
+                ["signed_blocks"],
+                key=summary_key,
+            ),
+            Stage(
+                "rewards_summary",
+                lambda tx_history: self._summarize_rewards(network, "rewards", tx_history) if tx_history else {},
+                ["tx_history"],
+                key=summary_key,
+            ),
+            Stage(
+                "sovereign_rewards_summary",
+                lambda tx_history: self._summarize_rewards(network, "sovereign_rewards", tx_history) if tx_history else {},
+                ["sovereign_tx_history"],
+                key=lambda tx_history: summary_key(tx_history or []),
+            ),
+            Stage(
+                "build",
+                lambda *outputs: self._build_cache(network, block_count, *outputs),
+                [
+                    "cycle_data", "chain_size", "current_block_reward", "tx_history", "sovereign_tx_history",
+                    "first_signed_blocks_summary", "signed_blocks_summary", "rewards_summary", "sovereign_rewards_summary",
+                ],
+            ),
+            Stage("save", lambda new_data: self._save_cache(network, new_data), ["build"]),
+        ]
+
+    async def _fetch_cycle_data(self, network, calls):
+        # node_cli calls go out concurrently on the loop, as a batch if the async client fails
+        try:
+            responses = await aio_rpc.call_many(calls.values())
+        except Exception as e:
+            logger.warning(f"Async node_cli calls failed for {network} ({e}), sending them as a batch")
+            responses = await run_in_background_from_loop(utils.send_batch, list(calls.values()))
+        return masternode_helpers.parse_cycle_data(network, dict(zip(calls, responses)))
+
+    @staticmethod
+    def _sovereign_addr(cycle_data):
+        return (cycle_data.get("node_info") or {}).get("sovereign_reward_wallet_address")
+
+    def _get_sovereign_tx_history(self, network, cycle_data):
+        sovereign_addr = self._sovereign_addr(cycle_data)
+        return (self._get_tx_history(network, sovereign_addr) or None) if sovereign_addr else None
+
+    def _merge_new_blocks(self, network, cache_key, from_date, raw_blocks):
+        if not raw_blocks:
+            return []
+        new_blocks = P.replace_timestamps(raw_blocks, blocks=True)
+        if not from_date:
+            return BlockList.from_dicts(new_blocks).sort_newest_first()
+        return self._merge_blocks(self.cache.get(network, {}).get(cache_key) or [], new_blocks)
+
+    def _build_cache(self, network, block_count, cycle_data, chain_size, current_block_reward, tx_history,
+                     sovereign_tx_history, fsb, sb, tx, sovereign_tx):
+        if tx_history:
+            self.rewards[network] = tx_history
+        if sovereign_tx_history:
+            self.sovereign_rewards[network] = sovereign_tx_history
+
+        new_data = {
+            "block_count_today": cycle_data.get("block_count_today"),
+            "block_count": block_count,
+            "chain_size": chain_size,
+            "current_block_reward": current_block_reward,
+            "first_signed_blocks_count": fsb.get("total"),
+            "first_signed_blocks_daily_amount": fsb.get("daily_amount"),
+            "first_signed_blocks_daily": fsb.get("daily"),
+            "first_signed_blocks_all_sums_daily": fsb.get("daily_sums"),
+            "first_signed_blocks_earliest": fsb.get("earliest"),
+            "first_signed_blocks_latest": fsb.get("latest"),
+            "first_signed_blocks_today_amount": fsb.get("today_amount"),
+            "first_signed_blocks_today": fsb.get("today"),
+            "first_signed_blocks_yesterday_amount": fsb.get("yesterday_amount"),
+            "first_signed_blocks_yesterday": fsb.get("yesterday"),
+            "native_ticker": masternode_helpers._active_networks_config[network].get('native_ticker'),
+            "signed_blocks_count": sb.get("total"),
+            "signed_blocks_daily_amount": sb.get("daily_amount"),
+            "signed_blocks_daily": sb.get("daily"),
+            "signed_blocks_all_sums_daily": sb.get("daily_sums"),
+            "signed_blocks_earliest": sb.get("earliest"),
+            "signed_blocks_latest": sb.get("latest"),
+            "signed_blocks_today_amount": sb.get("today_amount"),
+            "signed_blocks_today": sb.get("today"),
+            "signed_blocks_yesterday_amount": sb.get("yesterday_amount"),
+            "signed_blocks_yesterday": sb.get("yesterday"),
+            "reward_wallet_biggest_reward": tx.get("biggest"),
+            "reward_wallet_daily_rewards": tx.get("daily"),
+            "reward_wallet_all_sums_daily": tx.get("daily_sums"),
+            "reward_wallet_earliest_reward": tx.get("earliest_reward"),
+            "reward_wallet_latest_reward": tx.get("latest_reward"),
+            "reward_wallet_today_rewards": tx.get("today"),
+            "reward_wallet_yesterday_rewards": tx.get("yesterday"),
+            "reward_wallet_smallest_reward": tx.get("smallest"),
+            "reward_wallet_total_rewards": tx.get("total_rewards"),
+        }
+
+        if sovereign_tx_history:
+            new_data.update(
+                {
+                    "sovereign_wallet_biggest_reward": sovereign_tx.get("biggest"),
+                    "sovereign_wallet_daily_rewards": sovereign_tx.get("daily"),
+                    "sovereign_wallet_all_sums_daily": sovereign_tx.get("daily_sums"),
+                    "sovereign_wallet_earliest_reward": sovereign_tx.get("earliest_reward"),
+                    "sovereign_wallet_latest_reward": sovereign_tx.get("latest_reward"),
+                    "sovereign_wallet_today_rewards": sovereign_tx.get("today"),
+                    "sovereign_wallet_yesterday_rewards": sovereign_tx.get("yesterday"),
+                    "sovereign_wallet_smallest_reward": sovereign_tx.get("smallest"),
+                    "sovereign_wallet_total_rewards": sovereign_tx.get("total_rewards"),
+                }
+            )
+
+        new_data["cache_last_updated"] = utils.now_iso()
+
+        node_info = cycle_data.get("node_info")
+        if node_info:
+            new_data.update(node_info)
+        self.cache[network] = new_data
+        self.cache_state[network] = "ready"
+        self._build_snapshot(network)
+        return new_data
+
+    def _save_cache(self, network, new_data):
+        gdb_store.save_cache(network, new_data)
+        gdb_store.save_aggregates(
+            network, {name: aggregate.to_state() for name, aggregate in self.aggregates.get(network, {}).items()}
+        )
+
+    def _build_snapshot(self, network):
+        try:
+            payload = dict(self.cache.get(network, {}))
+            if self.rewards.get(network):
+                payload["rewards_full"] = self.rewards[network]
+            if self.sovereign_rewards.get(network):
+                payload["sovereign_rewards_full"] = self.sovereign_rewards[network]
+            snapshot = Snapshot(network, payload)
+            self.snapshots[network] = snapshot
+            logger.debug(f"Built response snapshot for {network}, ETag {snapshot.etag}")
+            return snapshot
+        except Exception as e:
+            logger.error(f"Failed to build response snapshot for {network}: {e}", exc_info=True)
+            return None
+
     def get_cache(self, network):
+        self._hydrate(network)
         return self.cache.get(network, {})
 
+    def get_list(self, network, name):
+        # The store behind a list-valued network action, for range and page queries
+        if name == "rewards_full":
+            value = self.rewards.get(network)
+        elif name == "sovereign_rewards_full":
+            value = self.sovereign_rewards.get(network)
+        else:
+            value = self.get_cache(network).get(name)
+        return value if isinstance(value, (BlockList, RewardList, TxHistory)) else None
+
+    def get_snapshot(self, network):
+        self._hydrate(network)
+        snapshot = self.snapshots.get(network)
+        if snapshot is None and self.cache.get(network):
+            snapshot = self._build_snapshot(network) # cache loaded from GDB, build on first use
+        return snapshot
+
 cacher = Cacher()
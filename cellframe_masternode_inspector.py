@@ -32,6 +32,7 @@ def main():
     if not masternode_helpers._active_networks_config:
         logger.warning("No active masternode configuration found, this plugin will not function on this node!")
         raise ConfigurationError("No active masternode configuration found")
+    Thread(target=system_requests.sample_node_usage, daemon=True).start()
     Thread(target=cacher.cache_everything, daemon=True).start()
     Thread(target=http_server, daemon=True).start()
     Thread(target=updater.run, daemon=True).start()
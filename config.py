@@ -12,8 +12,15 @@ class Config:
     BLOCK_COUNT_THRESHOLD = int(get_config_value("mninspector", "block_count_threshold", 30))
     FORCE_CACHE_REFRESH_INTERVAL = int(get_config_value("mninspector", "force_cache_refresh_interval", 3600))
     COMPRESS_RESPONSES = bool(get_config_value("mninspector", "compress_responses", True))
+    COMPRESSION_LEVEL = int(get_config_value("mninspector", "compression_level", 6))
+    COMPRESSION_MIN_SIZE = int(get_config_value("mninspector", "compression_min_size", 1024))
     DEBUG = bool(get_config_value("mninspector", "debug", False))
+    GDB_CODEC = str(get_config_value("mninspector", "gdb_codec", "zlib"))
     MIN_NODE_VERSION = "5.7.37"
     PLUGIN_NAME = str("Cellframe Masternode Inspector")
+    PROBE_INTERVAL = int(get_config_value("mninspector", "probe_interval", 10))
     PLUGIN_URL = str(get_config_value("mninspector", "plugin_url", "mninspector"))
+    RPC_TIMEOUT = int(get_config_value("mninspector", "rpc_timeout", 15))
+    REQUEST_TIMEOUT = int(get_config_value("mninspector", "request_timeout", 30))
+    MAX_REQUEST_TIMEOUT = int(get_config_value("mninspector", "max_request_timeout", 60))
     SUPPORTED_PLATFORMS = ["Linux"]
@@ -0,0 +1,214 @@
+from logconfig import logger
+from DAP.GlobalDB import DB as GlobalDB
+from config import Config
+from store import BlockList, RewardList, TxHistory
+import jsonlib
+import lzma, struct, zlib
+
+GDB_GROUP = "local.mninspectorcache"
+
+# Every record is framed: magic, layout schema version, codec id, CRC32 of the JSON payload
+RECORD_MAGIC = b"MNIC"
+RECORD_HEADER = struct.Struct("<4sHBI")
+SCHEMA_VERSION = 2 # 1 = one JSON blob per network, 2 = head record + per-day segments
+CODECS = {
+    "none": (0, lambda data: data, lambda data: data),
+    "zlib": (1, lambda data: zlib.compress(data, 6), zlib.decompress),
+    "lzma": (2, lzma.compress, lzma.decompress),
+}
+CODECS_BY_ID = {codec_id: decompress for codec_id, _, decompress in CODECS.values()}
+TX_HISTORY_CHUNK_SIZE = 1000
+
+# History lists that are persisted as one record per day instead of inside the network record
+SEGMENTED_KEYS = {
+    "first_signed_blocks_daily": BlockList,
+    "signed_blocks_daily": BlockList,
+    "reward_wallet_daily_rewards": RewardList,
+    "sovereign_wallet_daily_rewards": RewardList,
+}
+
+class GDBStore:
+    def __init__(self):
+        self._segments = {} # (network, key) -> {day: signature of what's in GDB}
+        self._tx_chunks = {} # (network, address) -> full tx history chunks in GDB
+
+    @staticmethod
+    def _encode(data):
+        payload = jsonlib.dumps_bytes(data)
+        codec_id, compress, _ = CODECS.get(Config.GDB_CODEC, CODECS["zlib"])
+        header = RECORD_HEADER.pack(RECORD_MAGIC, SCHEMA_VERSION, codec_id, zlib.crc32(payload))
+        return header + compress(payload)
+
+    @staticmethod
+    def _decode(raw):
+        # Returns (schema version, data), records from before framing are plain JSON
+        raw = bytes(raw)
+        if not raw.startswith(RECORD_MAGIC):
+            return None, jsonlib.loads(raw)
+        magic, schema, codec_id, checksum = RECORD_HEADER.unpack_from(raw)
+        decompress = CODECS_BY_ID.get(codec_id)
+        if decompress is None:
+            raise ValueError(f"unknown codec id {codec_id}")
+        payload = decompress(raw[RECORD_HEADER.size:])
+        if zlib.crc32(payload) != checksum:
+            raise ValueError("checksum mismatch")
+        return schema, jsonlib.loads(payload)
+
+    def _set(self, key, data):
+        try:
+            if not GlobalDB.set(key, GDB_GROUP, self._encode(data)):
+                logger.warning(f"GDB write failed for {key}")
+                return False
+            return True
+        except Exception as e:
+            logger.error(f"Failed to save {key} to GDB: {e}", exc_info=True)
+            return False
+
+    def _get(self, key, with_schema=False):
+        try:
+            raw = GlobalDB.get(key, GDB_GROUP)
+            if raw:
+                schema, data = self._decode(raw)
+                return (schema, data) if with_schema else data
+        except Exception as e:
+            logger.error(f"Failed to load {key} from GDB: {e}", exc_info=True)
+        return (None, None) if with_schema else None
+
+    @staticmethod
+    def _migrate_head(network, schema, head):
+        if schema is None:
+            # Unframed record, tell the layouts apart by the segment index
+            schema = 2 if "_segments" in head else 1
+        if schema > SCHEMA_VERSION:
+            logger.warning(f"Cache for {network} was written by a newer plugin version (schema {schema}), ignoring it")
+            return None
+        for version in range(schema, SCHEMA_VERSION):
+            logger.info(f"Migrating cache for {network} from schema {version} to {version + 1}")
+            head = MIGRATIONS[version](head)
+        return head
+
+    def _delete(self, key):
+        try:
+            GlobalDB.delete(key, GDB_GROUP)
+        except Exception as e:
+            logger.warning(f"Failed to delete {key} from GDB: {e}")
+
+    @staticmethod
+    def _signature(store):
+        return [len(store), store.hash_at(0), store.hash_at(-1)] if len(store) else [0, None, None]
+
+    def _save_day_segments(self, network, key, store):
+        runs = {}
+        for day, start, end in store.day_runs():
+            part = store[start:end]
+            runs[day] = runs[day] + part if day in runs else part
+
+        written = self._segments.setdefault((network, key), {})
+        rewritten = 0
+        for day, part in runs.items():
+            signature = self._signature(part)
+            if written.get(day) != signature and self._set(f"{network}.{key}.{day}", part):
+                written[day] = signature
+                rewritten += 1
+        for day in [d for d in written if d not in runs]:
+            self._delete(f"{network}.{key}.{day}")
+            del written[day]
+        logger.debug(f"{network}: wrote {rewritten}/{len(runs)} day segments of {key}")
+        return list(runs)
+
+    def save_cache(self, network, data):
+        # Small mutable head record, the long histories go to per-day segments that
+        # are only rewritten when that day changed
+        head = {}
+        segments = {}
+        for key, value in data.items():
+            if key in SEGMENTED_KEYS and isinstance(value, SEGMENTED_KEYS[key]):
+                segments[key] = self._save_day_segments(network, key, value)
+            else:
+                head[key] = value
+        head["_segments"] = segments
+        self._set(network, head)
+
+    def load_cache(self, network):
+        schema, head = self._get(network, with_schema=True)
+        if not head:
+            return None
+        head = self._migrate_head(network, schema, head)
+        if not head:
+            return None
+        for key, days in head.pop("_segments", {}).items():
+            store_cls = SEGMENTED_KEYS.get(key)
+            if not store_cls:
+                continue
+            written = self._segments[(network, key)] = {}
+            records = []
+            for day in days:
+                segment = self._get(f"{network}.{key}.{day}")
+                if segment is None:
+                    logger.warning(f"Day segment {day} of {key} missing for {network}")
+                    continue
+                records.extend(segment)
+                written[day] = [len(segment), segment[0].get(store_cls.HASH_KEY), segment[-1].get(store_cls.HASH_KEY)] if segment else [0, None, None]
+            head[key] = store_cls.from_dicts(records)
+        return head
+
+    def save_tx_history(self, network, address, data, rewrite=False):
+        # Chunks are counted from the oldest transaction, so every full chunk never changes again
+        history = data["history"]
+        count = len(history)
+        full_chunks = count // TX_HISTORY_CHUNK_SIZE
+        key = (network, address)
+        written = 0 if rewrite else self._tx_chunks.get(key, 0)
+        if written > full_chunks:
+            written = 0
+        last_chunk = full_chunks + (1 if count % TX_HISTORY_CHUNK_SIZE else 0)
+        for chunk in range(written, last_chunk):
+            start = max(0, count - (chunk + 1) * TX_HISTORY_CHUNK_SIZE)
+            end = count - chunk * TX_HISTORY_CHUNK_SIZE
+            if not self._set(f"{network}.tx_history.{address}.{chunk}", history[start:end]):
+                return
+        self._tx_chunks[key] = full_chunks
+        self._set(f"{network}.tx_history.{address}", {
+            "watermark": data.get("watermark"),
+            "count": count,
+            "chunk_size": TX_HISTORY_CHUNK_SIZE,
+        })
+
+    def load_tx_history(self, network, address):
+        head = self._get(f"{network}.tx_history.{address}")
+        if not head:
+            return None
+        if "history" in head:
+            head["history"] = TxHistory.from_dicts(head["history"] or []) # single record from older versions
+            return head
+
+        count = head.get("count", 0)
+        chunk_size = head.get("chunk_size", TX_HISTORY_CHUNK_SIZE)
+        chunks = -(-count // chunk_size)
+        records = []
+        for chunk in reversed(range(chunks)):
+            records.extend(self._get(f"{network}.tx_history.{address}.{chunk}") or [])
+        if len(records) != count:
+            logger.warning(f"Stored tx history of {address} on {network} is incomplete, ignoring it")
+            return None
+        if chunk_size == TX_HISTORY_CHUNK_SIZE:
+            self._tx_chunks[(network, address)] = count // chunk_size
+        head["history"] = TxHistory.from_dicts(records)
+        return head
+
+    def save_aggregates(self, network, states):
+        self._set(f"{network}.aggregates", states)
+
+    def load_aggregates(self, network):
+        return self._get(f"{network}.aggregates") or {}
+
+def _migrate_v1_to_v2(head):
+    # Lists were stored inline, they are loaded as they are and split into segments on the next save
+    head["_segments"] = {}
+    return head
+
+MIGRATIONS = {
+    1: _migrate_v1_to_v2,
+}
+
+gdb_store = GDBStore()
\ No newline at end of file
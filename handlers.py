@@ -3,6 +3,14 @@ from urllib.parse import parse_qs
 from utils import utils
 from response_helpers import ResponseHelpers as RH
 from actions import Actions
+from store import iso_to_epoch, INVALID_TS
+from config import Config
+from datetime import date, timedelta
+import re
+
+LIST_QUERY_PARAMS = ("from", "to", "limit", "offset", "cursor", "order")
+DATE_ONLY = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+SPACED_OFFSET = re.compile(r"^(.+[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?) (\d{2}:?\d{2})$")
 
 def request_handler(request):
     try:
@@ -71,13 +79,80 @@ def GET_request_handler(headers=None, query=None):
     if networks and not network_actions_requested:
         return RH.error("Network actions must be specified when requesting networks", code=400)
 
+    try:
+        list_query = _parse_list_query(parsed)
+        timeout = _parse_timeout(parsed)
+    except ValueError as e:
+        return RH.error(str(e), code=400)
+
+    etag = None
+    if not actions_requested:
+        etag = Actions.get_cached_etag(networks, network_actions_requested, list_query)
+        if_none_match = headers.get("If-None-Match") if headers else None
+        if etag and if_none_match and etag in [t.strip().removeprefix("W/") for t in if_none_match.split(",")]:
+            return RH.not_modified(etag)
+
+    # One deadline for everything the request asked for
+    deadline = Actions.request_deadline(timeout)
     result = {}
     if actions_requested:
-        result.update(Actions.parse_system_actions(actions_requested))
+        result.update(Actions.parse_system_actions(actions_requested, deadline))
     if networks and network_actions_requested:
-        result.update(Actions.parse_network_actions(networks, network_actions_requested))
-
-    return RH.success(result)
+        result.update(Actions.parse_network_actions(networks, network_actions_requested, list_query, deadline))
+
+    return RH.success(result, accept_encoding=headers.get("Accept-Encoding") if headers else None, etag=etag)
+
+def _parse_timestamp(value, end_of_day=False):
+    # Epoch seconds or an ISO 8601 date/datetime. A bare date as upper bound means the whole day.
+    if value.lstrip("-").isdigit():
+        return int(value)
+    # An unencoded "+" in the offset arrives as a space
+    value = SPACED_OFFSET.sub(r"\1+\2", value)
+    ts = iso_to_epoch(value)
+    if ts == INVALID_TS:
+        raise ValueError(f"invalid timestamp: {value}")
+    if end_of_day and DATE_ONLY.match(value):
+        return iso_to_epoch((date.fromisoformat(value) + timedelta(days=1)).isoformat()) - 1
+    return ts
+
+def _parse_timeout(parsed):
+    # Seconds the client is willing to wait for live actions, capped by the server
+    value = parsed.get("timeout", [None])[0]
+    if value is None:
+        return None
+    try:
+        timeout = float(value)
+    except ValueError:
+        raise ValueError("timeout must be a number of seconds")
+    if timeout <= 0:
+        raise ValueError("timeout must be a number of seconds")
+    return min(timeout, Config.MAX_REQUEST_TIMEOUT)
+
+def _parse_list_query(parsed):
+    # Range and page parameters for list-valued network actions, None when none were given
+    params = {name: parsed[name][0] for name in LIST_QUERY_PARAMS if name in parsed}
+    if not params:
+        return None
+    query = {}
+    if "from" in params:
+        query["from_ts"] = _parse_timestamp(params["from"])
+    if "to" in params:
+        query["to_ts"] = _parse_timestamp(params["to"], end_of_day=True)
+    for name in ("limit", "offset"):
+        if name in params:
+            if not params[name].isdigit():
+                raise ValueError(f"{name} must be a non-negative integer")
+            query[name] = int(params[name])
+    if "cursor" in params:
+        ts, _, item_hash = params["cursor"].partition(":")
+        if not ts.lstrip("-").isdigit() or not item_hash:
+            raise ValueError("invalid cursor")
+        query["cursor"] = params["cursor"]
+    if "order" in params:
+        if params["order"] not in ("asc", "desc"):
+            raise ValueError("order must be asc or desc")
+        query["order"] = params["order"]
+    return query
 
 def POST_request_handler():
     return RH.error("POST method not implemented yet!", code=501) # Will never be implemented?
\ No newline at end of file
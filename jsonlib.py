@@ -1,14 +1,25 @@
+def _default(obj):
+    # Compact stores (see store.py) turn themselves back into plain JSON types here
+    if hasattr(obj, "to_json"):
+        return obj.to_json()
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
 try:
     import orjson
     loads = orjson.loads
     def dumps(obj):
-        return orjson.dumps(obj).decode()
+        return orjson.dumps(obj, default=_default).decode()
     def dumps_bytes(obj):
-        return orjson.dumps(obj)
+        return orjson.dumps(obj, default=_default)
+    if hasattr(orjson, "Fragment"):
+        fragment = orjson.Fragment
+    else:
+        fragment = orjson.loads
 except ImportError:
     import json
     loads = json.loads
     def dumps(obj):
-        return json.dumps(obj, separators=(",", ":"))
+        return json.dumps(obj, separators=(",", ":"), default=_default)
     def dumps_bytes(obj):
-        return json.dumps(obj, separators=(",", ":")).encode()
+        return json.dumps(obj, separators=(",", ":"), default=_default).encode()
+    fragment = json.loads # no raw fragments in stdlib json, decode it back
\ No newline at end of file
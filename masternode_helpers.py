@@ -1,17 +1,22 @@
 from logconfig import logger
 from pycfhelpers.node.net import CFNet, NetFee
 from utils import utils
-import re, requests, os, time
+from threadpool import run_slow_io
+from ttl_cache import cached, live_cache
+import re, requests, os
 
 class MasternodeHelpers:
     LIVE_DATA_CACHE_TTL = 300  # 5 minutes
+    NETWORK_STATUS_TTL = 10
+    NODE_INFO_TTL = 60
+    AUTOCOLLECT_STATUS_TTL = 30
+    NODE_LIST_TTL = 60
 
     def __init__(self):
         logger.debug("Initializing MasternodeRequests...")
         self._node_address = None
         self._active_networks_config = {}
-        self._token_price_cache = {}
-        self._wallet_balance_cache = {}
+        self._cert_pkey_futures = {}
         self._get_active_networks()
         logger.debug(f"Active networks (masternode only): {self._active_networks_config}")
         logger.debug(f"Node address: {self._node_address}")
@@ -29,6 +34,80 @@ class MasternodeHelpers:
         except Exception as e:
             logger.error(f"Error fetching active networks: {e}")
 
+        # cellframe-node-tool is slow to start, look up the key hashes in the background
+        for network_name, net_config in self._active_networks_config.items():
+            self._cert_pkey_futures[network_name] = run_slow_io(
+                self._fetch_cert_pkey_hash, network_name, net_config['blocks_sign_cert']
+            )
+
+    @staticmethod
+    def _iter_items(obj, key=None):
+        # (key, value) for every scalar in a JSON-RPC result, however deeply it's nested
+        if isinstance(obj, dict):
+            for k, v in obj.items():
+                yield from MasternodeHelpers._iter_items(v, k)
+        elif isinstance(obj, list):
+            for v in obj:
+                yield from MasternodeHelpers._iter_items(v, key)
+        else:
+            yield key, obj
+
+    @staticmethod
+    def _rpc_result(response):
+        if not response or not isinstance(response, dict) or not response.get("result"):
+            return None
+        return response["result"]
+
+    @staticmethod
+    def _rpc_object(response):
+        # First object of a JSON-RPC result, None if the node answered with anything else
+        result = MasternodeHelpers._rpc_result(response)
+        first = result[0] if isinstance(result, list) else result
+        return first if isinstance(first, dict) else None
+
+    @staticmethod
+    def _rpc_float(value):
+        # Amounts come as numbers or as strings of digits, None for anything else
+        if isinstance(value, bool):
+            return None
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def _rpc_bool(value):
+        if isinstance(value, bool):
+            return value
+        return {"true": True, "false": False}.get(str(value).lower()) if value is not None else None
+
+    def _fetch_cert_pkey_hash(self, network, cert):
+        logger.debug(f"Fetching public key hash for cert {cert}...")
+        # Our own stake entry carries the key hash, no need to start cellframe-node-tool for it
+        result = self._rpc_result(utils.send_request(*self._node_info_call(network), use_unix=True))
+        for entry in (result[0] if result and isinstance(result[0], list) else []):
+            if isinstance(entry, dict) and entry.get("node_addr") == self._node_address and entry.get("pkey_hash"):
+                self._active_networks_config[network]['cert_pkey_hash'] = entry["pkey_hash"]
+                return entry["pkey_hash"]
+
+        logger.debug(f"Public key hash for {cert} not in the stake list, asking cellframe-node-tool")
+        cert_pkey_hash = utils.cli_command(f"cert pkey show {cert}", is_tool_command=True)
+        if cert_pkey_hash and isinstance(cert_pkey_hash, str):
+            self._active_networks_config[network]['cert_pkey_hash'] = cert_pkey_hash.strip()
+            return cert_pkey_hash.strip()
+        logger.warning(f"Could not fetch public key hash for cert {cert} on {network}")
+        return None
+
+    def get_cert_pkey_hash(self, network):
+        future = self._cert_pkey_futures.get(network)
+        if future:
+            try:
+                return future.result()
+            except Exception as e:
+                logger.error(f"Error fetching public key hash for {network}: {e}", exc_info=True)
+                return None
+        return self._active_networks_config[network].get('cert_pkey_hash')
+
     def get_network_config(self, network):
         network_config_file = f"/opt/cellframe-node/etc/network/{network}.cfg"
 
@@ -59,11 +138,6 @@ class MasternodeHelpers:
                 return None
 
             if "blocks_sign_cert" in net_config and "wallet" in net_config:
-                logger.debug(f"Fetching public key hash for cert {net_config['blocks_sign_cert']}...")
-                cert_pkey_hash = utils.cli_command(f"cert pkey show {net_config['blocks_sign_cert']}", is_tool_command=True)
-
-                if cert_pkey_hash:
-                    net_config['cert_pkey_hash'] = cert_pkey_hash.strip()
                 logger.debug(f"Valid masternode config for {network}")
                 return net_config
 
@@ -73,7 +147,25 @@ class MasternodeHelpers:
             logger.error(f"Error reading config file {network_config_file}: {e}")
             return None
 
+    @cached(AUTOCOLLECT_STATUS_TTL)
     def get_autocollect_status(self, network):
+        # {"active": ..., "tables": [{"profit": ...}, ...]}, anything else is left to the CLI
+        try:
+            status = self._rpc_object(utils.send_request(
+                "block", "autocollect status", {"net": network, "chain": "main"}, use_unix=True, timeout=3
+            ))
+            active = self._rpc_bool(status.get("active")) if status else None
+            tables = status.get("tables") if status else None
+            if active is not None and isinstance(tables, list):
+                profits = [self._rpc_float(table.get("profit")) for table in tables if isinstance(table, dict)]
+                if None not in profits:
+                    return {"rewards": sum(profits), "active": active}
+            logger.debug(f"Unexpected autocollect status from RPC for {network}: {status}")
+        except Exception as e:
+            logger.warning(f"Autocollect status RPC failed for {network} ({e}), falling back to CLI")
+        return self._get_autocollect_status_cli(network)
+
+    def _get_autocollect_status_cli(self, network):
         try:
             autocollect_status = {}
             autocollect_cmd = utils.cli_command(f"block autocollect status -net {network}", timeout=3)
@@ -89,6 +181,20 @@ class MasternodeHelpers:
             return None
 
     def get_current_block_reward(self, network):
+        # {"reward": ...}, anything else is left to the CLI
+        try:
+            status = self._rpc_object(utils.send_request(
+                "block", "reward show", {"net": network, "chain": "main"}, use_unix=True, timeout=3
+            ))
+            reward = self._rpc_float(status.get("reward")) if status else None
+            if reward is not None:
+                return reward
+            logger.debug(f"Unexpected block reward from RPC for {network}: {status}")
+        except Exception as e:
+            logger.warning(f"Block reward RPC failed for {network} ({e}), falling back to CLI")
+        return self._get_current_block_reward_cli(network)
+
+    def _get_current_block_reward_cli(self, network):
         try:
             block_reward_cmd = utils.cli_command(f"block reward show -net {network}", timeout=3)
             if block_reward_cmd:
@@ -99,19 +205,12 @@ class MasternodeHelpers:
             logger.error(f"Error fetching block reward for {network}: {e}", exc_info=True)
             return None
 
-    def get_block_count(self, network):
-        try:
-            response = utils.send_request(
-                "block",
-                "count",
-                arguments= {
-                    "net": network,
-                    "chain": "main"
-                    },
-                use_unix=True
-                )
+    def _block_count_call(self, network):
+        return ("block", "count", {"net": network, "chain": "main"})
 
-            if response:
+    def _parse_block_count(self, network, response):
+        try:
+            if response and response.get("result"):
                 count = response['result'][0]
                 block_count = next(iter(count.values()))
                 return block_count
@@ -120,80 +219,95 @@ class MasternodeHelpers:
             logger.error(f"An error occurred while fetching block count for {network}: {e}", exc_info=True)
             return 0
 
-    def get_blocks_on_network_today(self, network):
-        logger.debug(f"Fetching blocks from today for {network}")
-        try:
-            today_str = utils.current_time_in_format("%y%m%d")
-            response = utils.send_request(
-                "block",
-                "list",
-                arguments= {
-                    "net": network,
-                    "chain": "main",
-                    "from_date": today_str
-                    },
-                use_unix=True
-                )
+    def _blocks_today_call(self, network):
+        today_str = utils.current_time_in_format("%y%m%d")
+        return ("block", "list", {"net": network, "chain": "main", "from_date": today_str})
 
+    def _parse_blocks_today(self, network, response):
+        try:
             if not response or "result" not in response or not response['result']:
                 logger.warning(f"No blocks found for {network} today")
                 return 0
 
-            if response and "result" in response and response['result']:
-                blocks = response['result'][0][:-1]
-                return len(blocks) # Might be 0, but at least it's a number
-            logger.warning(f"No blocks found for {network} today")
-            return 0
+            blocks = response['result'][0][:-1]
+            return len(blocks) # Might be 0, but at least it's a number
         except Exception as e:
             logger.error(f"An error occurred while fetching signed blocks for {network}: {e}", exc_info=True)
             return 0
 
-    def get_signed_blocks(self, network, first_signed=False, from_date=None):
-        logger.debug(f"Fetching {'first signed' if first_signed else 'signed'} blocks for {network}"
-                     f"{f' from {from_date}' if from_date else ''}")
+    def _signed_blocks_call(self, network, first_signed=False, from_date=None):
+        pkey_hash = self.get_cert_pkey_hash(network)
+        args = {
+            "net": network,
+            "chain": "main",
+        }
+        if pkey_hash:
+            args["pkey_hash"] = pkey_hash
+        else:
+            args["cert"] = self._active_networks_config[network]['blocks_sign_cert']
+        if from_date:
+            args["from_date"] = from_date
+        return ("block", f"list {'first_signed' if first_signed else 'signed'}", args)
+
+    def _parse_signed_blocks(self, network, response, first_signed=False):
         try:
-            pkey_hash = self._active_networks_config[network]['cert_pkey_hash']
-            args = {
-                "net": network,
-                "chain": "main",
-            }
-            if pkey_hash:
-                args["pkey_hash"] = pkey_hash
-            else:
-                args["cert"] = self._active_networks_config[network]['blocks_sign_cert']
-            if from_date:
-                args["from_date"] = from_date
-            response = utils.send_request(
-                "block",
-                f"list {'first_signed' if first_signed else 'signed'}",
-                arguments=args,
-                use_unix=True
-                )
-
             if not response or "result" not in response or not response['result']:
                 return []
 
-            if response:
-                blocks = response['result'][0][:-1] # remove limit entry
-                logger.debug(f"Fetched {len(blocks)} {'first signed' if first_signed else 'signed'} blocks for {network}")
-                return blocks if blocks else []
-
-            return []
+            blocks = response['result'][0][:-1] # remove limit entry
+            logger.debug(f"Fetched {len(blocks)} {'first signed' if first_signed else 'signed'} blocks for {network}")
+            return blocks if blocks else []
         except Exception as e:
             logger.error(f"An error occurred while fetching signed blocks for {network}: {e}", exc_info=True)
             return []
 
-    def get_tx_history(self, network, address):
-        logger.debug(f"Fetching tx history for {network} with address {address}")
+    def get_signed_blocks(self, network, first_signed=False, from_date=None):
+        logger.debug(f"Fetching {'first signed' if first_signed else 'signed'} blocks for {network}"
+                     f"{f' from {from_date}' if from_date else ''}")
         try:
+            call = self._signed_blocks_call(network, first_signed, from_date)
+        except Exception as e:
+            logger.error(f"An error occurred while fetching signed blocks for {network}: {e}", exc_info=True)
+            return []
+        return self._parse_signed_blocks(network, utils.send_request(*call, use_unix=True), first_signed)
+
+    def get_sync_and_block_count(self, network):
+        # Network status and block count in one round trip
+        status, count = utils.send_batch([self._network_status_call(network), self._block_count_call(network)])
+        return self._parse_network_status(network, status), self._parse_block_count(network, count)
+
+    def cycle_data_calls(self, network, signed_from_date=None, fsb_from_date=None):
+        # Everything a cache refresh needs from the node_cli socket
+        return {
+            "node_info": self._node_info_call(network),
+            "block_count_today": self._blocks_today_call(network),
+            "first_signed_blocks": self._signed_blocks_call(network, True, fsb_from_date),
+            "signed_blocks": self._signed_blocks_call(network, False, signed_from_date),
+        }
+
+    def parse_cycle_data(self, network, responses):
+        return {
+            "node_info": self._parse_node_info(network, responses["node_info"]),
+            "block_count_today": self._parse_blocks_today(network, responses["block_count_today"]),
+            "first_signed_blocks": self._parse_signed_blocks(network, responses["first_signed_blocks"], True),
+            "signed_blocks": self._parse_signed_blocks(network, responses["signed_blocks"]),
+        }
+
+    def get_tx_history(self, network, address, limit=None, offset=None):
+        logger.debug(f"Fetching tx history for {network} with address {address}"
+                     f"{f' (limit {limit}, offset {offset})' if limit else ''}")
+        try:
+            args = {
+                "net": network,
+                "addr": address,
+                "limit": limit
+            }
+            if offset:
+                args["offset"] = offset
             response = utils.send_request(
                 "tx_history",
                 subcommand=None,
-                arguments={
-                    "net": network,
-                    "addr": address,
-                    "limit": None
-                    }
+                arguments=args
                 )
 
             if not response or "result" not in response or not response['result']:
@@ -210,9 +324,15 @@ class MasternodeHelpers:
             logger.error(f"An error occurred while fetching rewards collected for {network}: {e}", exc_info=True)
             return []
 
+    def _network_status_call(self, network):
+        return ("net", "get status", {"net": network})
+
+    @cached(NETWORK_STATUS_TTL)
     def get_network_status(self, network):
+        return self._parse_network_status(network, utils.send_request(*self._network_status_call(network), use_unix=True))
+
+    def _parse_network_status(self, network, response):
         try:
-            response = utils.send_request("net", "get status", {"net": network}, use_unix=True)
             if not response or "result" not in response or not response['result']:
                 return None
 
@@ -252,11 +372,17 @@ class MasternodeHelpers:
             logger.error(f"An error occurred while checking sync status for {network}: {e}", exc_info=True)
             return []
 
+    def _node_info_call(self, network):
+        return ("srv_stake", "list keys", {"net": network})
+
+    @cached(NODE_INFO_TTL)
     def get_node_info(self, network):
+        return self._parse_node_info(network, utils.send_request(*self._node_info_call(network), use_unix=True))
+
+    def _parse_node_info(self, network, response):
         try:
             node_info = {}
             total_active_masternodes = 0
-            response = utils.send_request("srv_stake", "list keys", {"net": network}, use_unix=True)
             if response and "result" in response and response['result']:
                 entries = response['result'][0]
                 for entry in entries:
@@ -279,7 +405,19 @@ class MasternodeHelpers:
             logger.error(f"An error occurred while fetching node info for {network}: {e}", exc_info=True)
             return {}
 
+    @cached(NODE_LIST_TTL)
     def get_node_in_node_list(self, network):
+        try:
+            result = self._rpc_result(utils.send_request("node", "list", {"net": network}, use_unix=True, timeout=3))
+            if result:
+                found = any(value == self._node_address for _, value in self._iter_items(result))
+                logger.debug(f"Node address {self._node_address} {'found' if found else 'NOT found'} in node list for {network}")
+                return found
+        except Exception as e:
+            logger.warning(f"Node list RPC failed for {network} ({e}), falling back to CLI")
+        return self._get_node_in_node_list_cli(network)
+
+    def _get_node_in_node_list_cli(self, network):
         try:
             response = utils.cli_command(f"node list -net {network}", timeout=3)
             if response and self._node_address in response:
@@ -291,15 +429,8 @@ class MasternodeHelpers:
             logger.error(f"An error occurred while checking node list for {network}: {e}", exc_info=True)
             return False
 
+    @cached(LIVE_DATA_CACHE_TTL)
     def get_wallet_balance(self, network, address):
-        cache_key = f"{network}:{address}"
-        cached = self._wallet_balance_cache.get(cache_key)
-        if cached:
-            balance, ts = cached
-            if time.time() - ts < self.LIVE_DATA_CACHE_TTL:
-                logger.debug(f"Using cached wallet balance for {cache_key}")
-                return balance
-
         try:
             response = utils.send_request(
                 "wallet",
@@ -320,13 +451,15 @@ class MasternodeHelpers:
                 if "token" in t and "coins" in t
             }
 
-            self._wallet_balance_cache[cache_key] = (balances, time.time())
             logger.debug(balances)
             return balances
         except Exception as e:
             logger.error(f"Failed to get wallet balance for {network}: {e}", exc_info=True)
             return {}
 
+    def get_live_cache_stats(self):
+        return live_cache.stats()
+
     def get_chain_size(self, network):
         try:
             network_mapping = {
@@ -349,14 +482,8 @@ class MasternodeHelpers:
             logger.error(f"An error occurred while fetching chain size for {network}: {e}", exc_info=True)
             return None
 
+    @cached(LIVE_DATA_CACHE_TTL)
     def get_token_price(self, network):
-        cached = self._token_price_cache.get(network)
-        if cached:
-            price, ts = cached
-            if time.time() - ts < self.LIVE_DATA_CACHE_TTL:
-                logger.debug(f"Using cached token price for {network}: {price}")
-                return price
-
         try:
             logger.debug("Fetching token price...")
             network_urls = {
@@ -376,7 +503,6 @@ class MasternodeHelpers:
                 regex_match = re.search(regex_patterns[network.lower()], response.text)
                 if regex_match:
                     token_price = float(regex_match.group(1))
-                    self._token_price_cache[network] = (token_price, time.time())
                     logger.debug(f"Token price for {network} is {token_price}")
                     return token_price
                 logger.warning(f"Price not found in {url}")
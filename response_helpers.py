@@ -1,49 +1,159 @@
-import gzip
+import itertools, struct, zlib
 from pycfhelpers.node.http.simple import CFSimpleHTTPResponse
 from logconfig import logger
 from utils import utils
+from snapshot import Snapshot, SnapshotView
 import jsonlib
 from config import Config
 
+GZIP_HEADER = b"\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff"
+ZLIB_HEADER = b"\x78\x9c"
+SUPPORTED_ENCODINGS = ("gzip", "deflate") # in order of preference
+
 class ResponseHelpers:
     DEFAULT_HEADERS = {
         "Content-Type": "application/json",
         "Access-Control-Allow-Origin": "*",
         "Access-Control-Allow-Methods": "GET, POST, OPTIONS",
-        "Access-Control-Allow-Headers": "Content-Type, Accept-Encoding, Authorization, X-API-Key",
-        "Access-Control-Expose-Headers": "Content-Type, Content-Encoding",
+        "Access-Control-Allow-Headers": "Content-Type, Accept-Encoding, Authorization, X-API-Key, If-None-Match",
+        "Access-Control-Expose-Headers": "Content-Type, Content-Encoding, ETag",
+        "Vary": "Accept-Encoding",
     }
 
     @staticmethod
-    def _encode_body(data, gzip_enabled=None):
-        gzip_enabled = Config.COMPRESS_RESPONSES
+    def negotiate_encoding(accept_encoding):
+        # Best of gzip/deflate the client accepts, None for identity
+        if not Config.COMPRESS_RESPONSES or not accept_encoding:
+            return None
+        weights = {}
+        for entry in accept_encoding.split(","):
+            name, _, params = entry.strip().partition(";")
+            weight = 1.0
+            params = params.strip()
+            if params.startswith("q="):
+                try:
+                    weight = float(params[2:])
+                except ValueError:
+                    weight = 0.0
+            weights[name.strip().lower()] = weight
+        best, best_weight = None, 0.0
+        for encoding in SUPPORTED_ENCODINGS:
+            weight = weights.get(encoding, weights.get("*", 0.0))
+            if weight > best_weight:
+                best, best_weight = encoding, weight
+        return best
+
+    @staticmethod
+    def _iter_body(value):
+        # The JSON document in pieces: dicts are walked, big lists come out a few hundred rows
+        # at a time and network snapshots are passed through as is so their tail can be spliced
+        if isinstance(value, SnapshotView):
+            yield value.head()
+            yield value.snapshot
+        elif isinstance(value, dict):
+            yield b"{"
+            for i, (key, item) in enumerate(value.items()):
+                yield (b"," if i else b"") + jsonlib.dumps_bytes(key) + b":"
+                yield from ResponseHelpers._iter_body(item)
+            yield b"}"
+        elif hasattr(value, "iter_json"):
+            yield from value.iter_json()
+        else:
+            yield jsonlib.dumps_bytes(value)
+
+    @staticmethod
+    def _compress_stream(parts, encoding):
+        # Compressed as the document is generated, the raw JSON is never held in full.
+        # Snapshot tails are already deflated, only the parts around them get compressed here.
+        level = Config.COMPRESSION_LEVEL
+        if encoding == "gzip":
+            out, checksum, value = [GZIP_HEADER], zlib.crc32, 0
+        else:
+            out, checksum, value = [ZLIB_HEADER], zlib.adler32, 1
+        size = 0
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+        for part in parts:
+            if isinstance(part, Snapshot):
+                out.append(compressor.flush(zlib.Z_SYNC_FLUSH))
+                out.append(part.tail_deflated)
+                for piece in part.tail_pieces():
+                    value = checksum(piece, value)
+                size += part.tail_size
+                # Fresh compressor so nothing references back into the spliced segment
+                compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+            else:
+                out.append(compressor.compress(part))
+                value = checksum(part, value)
+                size += len(part)
+        out.append(compressor.flush())
+        if encoding == "gzip":
+            out.append(struct.pack("<II", value & 0xFFFFFFFF, size & 0xFFFFFFFF))
+        else:
+            out.append(struct.pack(">I", value & 0xFFFFFFFF))
+        return b"".join(out)
+
+    @staticmethod
+    def _raw_stream(parts):
+        for part in parts:
+            if isinstance(part, Snapshot):
+                yield from part.tail_pieces()
+            else:
+                yield part
 
-        body = jsonlib.dumps_bytes(data)
-        logger.debug(f"Body uncompressed size: {len(body)} bytes")
+    @staticmethod
+    def _encode_body(data, accept_encoding=None):
         headers = dict(ResponseHelpers.DEFAULT_HEADERS)
+        encoding = ResponseHelpers.negotiate_encoding(accept_encoding)
+        parts = ResponseHelpers._iter_body(data)
+
+        # Look ahead until the body is big enough to be worth compressing
+        head = []
+        head_size = 0
+        if encoding:
+            for part in parts:
+                head.append(part)
+                head_size += part.tail_size if isinstance(part, Snapshot) else len(part)
+                if head_size >= Config.COMPRESSION_MIN_SIZE:
+                    break
+            if head_size < Config.COMPRESSION_MIN_SIZE:
+                encoding = None
+        parts = itertools.chain(head, parts)
 
-        if gzip_enabled:
-            body = gzip.compress(body)
-            logger.debug(f"Body compressed size: {len(body)} bytes")
-            headers["Content-Encoding"] = "gzip"
+        if encoding:
+            body = ResponseHelpers._compress_stream(parts, encoding)
+            logger.debug(f"Body {encoding} compressed size: {len(body)} bytes")
+            headers["Content-Encoding"] = encoding
+        else:
+            body = b"".join(ResponseHelpers._raw_stream(parts))
+            logger.debug(f"Body uncompressed size: {len(body)} bytes")
 
         return body, headers
 
     @staticmethod
-    def success(data, code=200, gzip_enabled=None):
+    def success(data, code=200, accept_encoding=None, etag=None):
         body, headers = ResponseHelpers._encode_body(
             {"request_timestamp": utils.now_iso(), "status": "ok", "data": data},
-            gzip_enabled
+            accept_encoding
         )
+        if etag:
+            # Weak, the same data goes out gzip, deflate or plain and those bodies differ byte for byte
+            headers["ETag"] = "W/" + etag
         logger.debug(f"Response body size: {len(body)} bytes")
         logger.debug(f"Response headers: {headers}")
         return CFSimpleHTTPResponse(body=body, code=code, headers=headers)
 
     @staticmethod
-    def error(message, code=400, gzip_enabled=None):
+    def not_modified(etag):
+        logger.debug(f"Client has current data, ETag: {etag}")
+        headers = dict(ResponseHelpers.DEFAULT_HEADERS)
+        headers["ETag"] = "W/" + etag
+        return CFSimpleHTTPResponse(body=b"", code=304, headers=headers)
+
+    @staticmethod
+    def error(message, code=400, accept_encoding=None):
         body, headers = ResponseHelpers._encode_body(
             {"request_timestamp": utils.now_iso(), "status": "error", "message": message},
-            gzip_enabled
+            accept_encoding
         )
         return CFSimpleHTTPResponse(body=body, code=code, headers=headers)
 
@@ -0,0 +1,121 @@
+import threading, time
+from logconfig import logger
+from exceptions import RequestError
+
+# Picks the backend (public RPC or the local node_cli socket) for node calls that can go
+# either way. Every backend keeps a smoothed latency and a circuit breaker: after a few
+# failures in a row it is skipped for a cooldown, then a single probe call decides whether
+# it's back. Calls go to the fastest backend that is not skipped, the others are fallbacks.
+
+class Backend:
+    FAILURE_THRESHOLD = 3
+    COOLDOWN = 30 # seconds, doubled every time a probe fails
+    MAX_COOLDOWN = 300
+    LATENCY_SMOOTHING = 0.3
+
+    def __init__(self, name, send):
+        self.name = name
+        self.send = send
+        self.latency = None
+        self.calls = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.state = "closed"
+        self.cooldown = self.COOLDOWN
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def _cooled_down(self):
+        return self.state == "open" and time.monotonic() - self.opened_at >= self.cooldown
+
+    def available(self):
+        # Closed circuits, and open ones whose cooldown is over. No state change here, a backend
+        # only turns half open once the probe is actually sent (begin_call)
+        with self._lock:
+            return self.state == "closed" or self._cooled_down()
+
+    def probe_due(self):
+        with self._lock:
+            return self._cooled_down()
+
+    def begin_call(self):
+        # Right before sending: False while open, or while another call is already probing
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self._cooled_down():
+                self.state = "half_open"
+                logger.info(f"RPC backend {self.name}: cooldown over, probing")
+                return True
+            return False
+
+    def record_success(self, elapsed):
+        with self._lock:
+            self.calls += 1
+            self.latency = elapsed if self.latency is None else (
+                self.LATENCY_SMOOTHING * elapsed + (1 - self.LATENCY_SMOOTHING) * self.latency
+            )
+            self.consecutive_failures = 0
+            if self.state != "closed":
+                logger.info(f"RPC backend {self.name} is healthy again")
+            self.state = "closed"
+            self.cooldown = self.COOLDOWN
+
+    def record_failure(self):
+        with self._lock:
+            self.calls += 1
+            self.failures += 1
+            self.consecutive_failures += 1
+            if self.state == "half_open":
+                self.cooldown = min(self.cooldown * 2, self.MAX_COOLDOWN)
+            elif self.consecutive_failures < self.FAILURE_THRESHOLD:
+                return
+            self.state = "open"
+            self.opened_at = time.monotonic()
+            logger.warning(f"RPC backend {self.name} failing, skipping it for {self.cooldown}s")
+
+    def stats(self):
+        return {
+            "state": self.state,
+            "latency_ms": round(self.latency * 1000, 1) if self.latency is not None else None,
+            "calls": self.calls,
+            "failures": self.failures,
+            "error_rate": round(self.failures / self.calls, 3) if self.calls else None,
+        }
+
+class RpcRouter:
+    def __init__(self, backends):
+        self.backends = backends # in order of preference while latencies are unknown
+
+    def _ordered(self):
+        # Backends due for a probe first so they get the chance to close again, then unmeasured
+        # ones so each gets measured, then by latency
+        return sorted(
+            self.backends,
+            key=lambda b: (not b.probe_due(), b.latency is not None, b.latency or 0),
+        )
+
+    def call(self, request_data, timeout=None):
+        last_error = None
+        candidates = [backend for backend in self._ordered() if backend.available()]
+        forced = not candidates
+        if forced:
+            # Everything is open, try them anyway rather than failing without asking
+            candidates = self._ordered()
+        for backend in candidates:
+            if not forced and not backend.begin_call():
+                continue
+            started = time.monotonic()
+            try:
+                result = backend.send(request_data, timeout)
+            except Exception as e:
+                backend.record_failure()
+                last_error = e
+                logger.warning(f"RPC call over {backend.name} failed ({e})")
+                continue
+            backend.record_success(time.monotonic() - started)
+            return result
+        raise last_error or RequestError("No RPC backend available")
+
+    def stats(self):
+        return {backend.name: backend.stats() for backend in self.backends}
@@ -0,0 +1,55 @@
+import hashlib, zlib
+import jsonlib
+
+# Pre-serialized cache payload of a single network, rebuilt once per cache refresh
+class Snapshot:
+    def __init__(self, network, data):
+        self.network = network
+        self.cache_last_updated = data.get("cache_last_updated")
+        self.etag = '"' + hashlib.sha1(f"{network}:{self.cache_last_updated}".encode()).hexdigest()[:20] + '"'
+        self.values = {k: jsonlib.dumps_bytes(v) for k, v in data.items()}
+        self._keys = {k: jsonlib.dumps_bytes(k) + b":" for k in self.values}
+
+        # Raw deflate segment of the object tail, ends with a sync flush so it can be
+        # spliced into a bigger gzip stream without recompressing it per request
+        compressor = zlib.compressobj(9, zlib.DEFLATED, -zlib.MAX_WBITS)
+        deflated = []
+        self.tail_size = 0
+        for piece in self.tail_pieces():
+            deflated.append(compressor.compress(piece))
+            self.tail_size += len(piece)
+        deflated.append(compressor.flush(zlib.Z_SYNC_FLUSH))
+        self.tail_deflated = b"".join(deflated)
+
+    def tail_pieces(self):
+        # Everything after the opening brace: "key":value,"key":value}
+        for i, (k, v) in enumerate(self.values.items()):
+            if i:
+                yield b","
+            yield self._keys[k]
+            yield v
+        yield b"}"
+
+    def fragment(self, key):
+        return jsonlib.fragment(self.values[key])
+
+    def with_live(self, live):
+        return SnapshotView(self, live)
+
+# Live action results merged in front of a network snapshot
+class SnapshotView:
+    def __init__(self, snapshot, live):
+        self.snapshot = snapshot
+        self.live = live
+
+    def head(self):
+        live = jsonlib.dumps_bytes(self.live)[1:-1]
+        if live and self.snapshot.values:
+            return b"{" + live + b","
+        return b"{" + live
+
+    def to_bytes(self):
+        return self.head() + b"".join(self.snapshot.tail_pieces())
+
+    def to_json(self):
+        return jsonlib.fragment(self.to_bytes())
@@ -0,0 +1,86 @@
+import asyncio, time
+from logconfig import logger
+
+# Runs a cache refresh as a graph of named stages. Every stage lists the stages whose
+# outputs it takes, in order, and starts as soon as those are done, so independent stages
+# overlap. Coroutine stages run on the loop, plain functions are handed to submit, a coroutine
+# that runs them on a thread pool lane without blocking the loop.
+# A stage with a key function is skipped when its key matches the one of its last run,
+# the output of that run is handed on instead.
+
+class Stage:
+    def __init__(self, name, func, inputs=(), key=None):
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.key = key
+
+class StageRunner:
+    def __init__(self, name, submit):
+        self.name = name
+        self.submit = submit
+        self._previous = {} # stage name -> (key, output) of the last run
+        self.last_run = {}
+
+    @staticmethod
+    def _size(output):
+        # Rows for stores and lists, keys for dicts
+        if output is None:
+            return 0
+        try:
+            return len(output)
+        except TypeError:
+            return None
+
+    async def run(self, stages):
+        defined = set()
+        for stage in stages:
+            # Inputs must come earlier in the list, that also rules out cycles
+            missing = [name for name in stage.inputs if name not in defined]
+            if missing:
+                raise ValueError(f"Stage {stage.name} reads {', '.join(missing)} before it is defined")
+            defined.add(stage.name)
+
+        tasks = {}
+        report = {}
+
+        async def run_stage(stage):
+            args = [await tasks[name] for name in stage.inputs]
+            started = time.monotonic()
+            key = stage.key(*args) if stage.key else None
+            previous = self._previous.get(stage.name)
+            if previous and previous[0] == key:
+                output, status = previous[1], "skipped"
+            else:
+                try:
+                    if asyncio.iscoroutinefunction(stage.func):
+                        output = await stage.func(*args)
+                    else:
+                        output = await self.submit(stage.func, *args)
+                except Exception:
+                    report[stage.name] = {"status": "failed", "ms": round((time.monotonic() - started) * 1000, 1), "size": None}
+                    raise
+                status = "ran"
+                if stage.key:
+                    self._previous[stage.name] = (key, output)
+            report[stage.name] = {"status": status, "ms": round((time.monotonic() - started) * 1000, 1), "size": self._size(output)}
+            return output
+
+        for stage in stages:
+            tasks[stage.name] = asyncio.ensure_future(run_stage(stage))
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            # One failed or the whole run was cancelled, nothing downstream is worth finishing
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+        finally:
+            self.last_run = report
+        logger.debug(f"{self.name}: stages {self.slowest(len(report))}")
+        return {name: task.result() for name, task in tasks.items()}
+
+    def slowest(self, count=3):
+        ranked = sorted(self.last_run.items(), key=lambda item: item[1]["ms"], reverse=True)[:count]
+        return ", ".join(f"{name} {stats['ms'] / 1000:.2f}s" + (" (skipped)" if stats["status"] == "skipped" else "") for name, stats in ranked)
@@ -0,0 +1,345 @@
+from abc import ABC, abstractmethod
+from array import array
+from datetime import datetime, time
+import sys
+import jsonlib
+
+# Compact storage for the big cached lists. Blocks and rewards are kept column by column
+# (hashes, epoch second timestamps, ...) and only turned back into dicts when serialized.
+
+INVALID_TS = -1
+JSON_CHUNK_ROWS = 500
+_MISSING = object()
+
+def iso_to_epoch(ts):
+    try:
+        return int(datetime.fromisoformat(ts).timestamp())
+    except Exception:
+        return INVALID_TS
+
+def epoch_to_iso(ts):
+    if ts == INVALID_TS:
+        return None
+    return datetime.fromtimestamp(ts).astimezone().isoformat()
+
+def first_before(timestamps, ts, lo=0):
+    # First index from lo on with a timestamp below ts, timestamps are newest first
+    hi = len(timestamps)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if timestamps[mid] >= ts:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+def make_cursor(store, i):
+    return f"{store.timestamps[i]}:{store.hash_at(i)}"
+
+def _cursor_position(store, cursor):
+    # Rows with the cursor's timestamp and the index of the cursor row among them, if it's still there
+    ts, _, item_hash = cursor.partition(":")
+    ts = int(ts)
+    lo = first_before(store.timestamps, ts + 1)
+    hi = first_before(store.timestamps, ts)
+    for i in range(lo, hi):
+        if store.hash_at(i) == item_hash:
+            return i, lo, hi
+    return None, lo, hi
+
+def page(store, from_ts=None, to_ts=None, limit=None, offset=0, cursor=None, order="desc"):
+    # One page of a newest first store, the time range is found by binary search
+    start = first_before(store.timestamps, to_ts + 1) if to_ts is not None else 0
+    end = first_before(store.timestamps, from_ts) if from_ts is not None else len(store)
+    end = max(start, end)
+    total = end - start
+
+    if cursor:
+        i, lo, hi = _cursor_position(store, cursor)
+        if order == "desc":
+            start = max(start, hi if i is None else i + 1)
+        else:
+            end = min(end, lo if i is None else i)
+    if order == "desc":
+        a = min(start + offset, end)
+        b = end if limit is None else min(a + limit, end)
+        items = store[a:b]
+        next_index = b - 1 if b < end and b > a else None
+    else:
+        b = max(end - offset, start)
+        a = start if limit is None else max(b - limit, start)
+        items = store[a:b][::-1]
+        next_index = a if a > start and b > a else None
+
+    return {
+        "items": items,
+        "total": total,
+        "next_cursor": make_cursor(store, next_index) if next_index is not None else None,
+    }
+
+class _ColumnStore(ABC):
+    # Rows are kept newest first, the timestamps column doubles as the sorted index
+    __slots__ = ("_hash_set",)
+    TS_KEY = None
+    HASH_KEY = None
+
+    # The column arrays, in the order _from_columns takes them
+    @abstractmethod
+    def _columns(self): ...
+
+    # A store of the same kind over the given columns
+    @abstractmethod
+    def _from_columns(self, columns): ...
+
+    # Row i as a dict
+    @abstractmethod
+    def _record(self, i): ...
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self._from_columns([column[index] for column in self._columns()])
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("store index out of range")
+        return self._record(index)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._record(i)
+
+    def __add__(self, other):
+        if not other:
+            return self
+        if not self:
+            return other
+        return self._from_columns([a + b for a, b in zip(self._columns(), other._columns())])
+
+    def take(self, order):
+        # New store with the rows in the given order
+        columns = []
+        for column in self._columns():
+            if isinstance(column, array):
+                columns.append(array(column.typecode, (column[i] for i in order)))
+            else:
+                columns.append([column[i] for i in order])
+        return self._from_columns(columns)
+
+    def hash_at(self, i):
+        return self._hashes()[i]
+
+    def hash_set(self):
+        # Built once and then carried over to the stores merged from this one
+        if self._hash_set is None:
+            self._hash_set = set(self._hashes())
+        return self._hash_set
+
+    def sort_newest_first(self):
+        ts = self.timestamps
+        if all(ts[i] >= ts[i + 1] for i in range(len(ts) - 1)):
+            return self
+        return self.take(sorted(range(len(ts)), key=ts.__getitem__, reverse=True))
+
+    def day_runs(self):
+        # (day, start, end) for every run of rows from the same local day, newest first.
+        # The end of each day is found by binary search, one date lookup per day.
+        runs = []
+        timestamps = self.timestamps
+        start = 0
+        while start < len(timestamps):
+            ts = timestamps[start]
+            if ts == INVALID_TS:
+                runs.append(("unknown", start, len(timestamps)))
+                break
+            d = datetime.fromtimestamp(ts).date()
+            end = first_before(timestamps, int(datetime.combine(d, time.min).timestamp()), start + 1)
+            runs.append((d.isoformat(), start, end))
+            start = end
+        return runs
+
+    def to_json(self):
+        return [self._record(i) for i in range(len(self))]
+
+    def iter_json(self, rows=JSON_CHUNK_ROWS):
+        # The JSON array in pieces of a few hundred rows, for streaming responses
+        yield b"["
+        for start in range(0, len(self), rows):
+            if start:
+                yield b","
+            yield jsonlib.dumps_bytes([self._record(i) for i in range(start, min(start + rows, len(self)))])[1:-1]
+        yield b"]"
+
+class BlockList(_ColumnStore):
+    __slots__ = ("hashes", "timestamps", "extra_keys", "extra")
+    TS_KEY = "ts_create"
+    HASH_KEY = "hash"
+
+    def __init__(self, hashes=None, timestamps=None, extra_keys=(), extra=()):
+        self._hash_set = None
+        self.hashes = hashes if hashes is not None else []
+        self.timestamps = timestamps if timestamps is not None else array("q")
+        # Anything the node sends besides hash and ts_create, one column per key
+        self.extra_keys = list(extra_keys)
+        self.extra = list(extra)
+
+    @classmethod
+    def from_dicts(cls, blocks):
+        store = cls()
+        for block in blocks:
+            store.append(block)
+        return store
+
+    def append(self, block):
+        i = len(self.hashes)
+        self.hashes.append(block.get("hash"))
+        self.timestamps.append(iso_to_epoch(block.get("ts_create")))
+        for key, value in block.items():
+            if key in ("hash", "ts_create"):
+                continue
+            if key not in self.extra_keys:
+                self.extra_keys.append(key)
+                self.extra.append([_MISSING] * i)
+            self.extra[self.extra_keys.index(key)].append(value)
+        for column in self.extra:
+            if len(column) == i:
+                column.append(_MISSING)
+
+    def _hashes(self):
+        return self.hashes
+
+    def merge(self, blocks):
+        # New store with the blocks we don't have yet put in place by binary search on the
+        # timestamps, no full re-sort. The hash set moves over to the merged store.
+        known = self.hash_set()
+        added = []
+        for block in blocks:
+            block_hash = block.get("hash")
+            if block_hash and block_hash not in known:
+                known.add(block_hash)
+                added.append(block)
+        if not added:
+            return self
+        new = BlockList.from_dicts(added).sort_newest_first()
+
+        if new.extra_keys != self.extra_keys:
+            merged = (self + new).sort_newest_first()
+        elif not self or new.timestamps[-1] > self.timestamps[0]:
+            merged = new + self # the usual case, everything new is newer than what we have
+        else:
+            merged = self._from_columns([column[:] for column in self._columns()])
+            columns = merged._columns()
+            new_columns = new._columns()
+            for i in range(len(new)):
+                pos = first_before(merged.timestamps, new.timestamps[i])
+                for column, new_column in zip(columns, new_columns):
+                    column.insert(pos, new_column[i])
+        merged._hash_set = known
+        self._hash_set = None
+        return merged
+
+    def _columns(self):
+        return [self.hashes, self.timestamps] + self.extra
+
+    def _from_columns(self, columns):
+        return BlockList(columns[0], columns[1], self.extra_keys, columns[2:])
+
+    def __add__(self, other):
+        if other and self and other.extra_keys != self.extra_keys:
+            return BlockList.from_dicts(list(self) + list(other))
+        return super().__add__(other)
+
+    def _record(self, i):
+        record = {"hash": self.hashes[i], "ts_create": epoch_to_iso(self.timestamps[i])}
+        for key, column in zip(self.extra_keys, self.extra):
+            if column[i] is not _MISSING:
+                record[key] = column[i]
+        return record
+
+class RewardList(_ColumnStore):
+    __slots__ = ("tx_hashes", "timestamps", "recv_coins", "tokens")
+    TS_KEY = "tx_created"
+    HASH_KEY = "tx_hash"
+
+    def __init__(self, tx_hashes=None, timestamps=None, recv_coins=None, tokens=None):
+        self._hash_set = None
+        self.tx_hashes = tx_hashes if tx_hashes is not None else []
+        self.timestamps = timestamps if timestamps is not None else array("q")
+        self.recv_coins = recv_coins if recv_coins is not None else [] # kept as strings, the node sends exact decimals
+        self.tokens = tokens if tokens is not None else []
+
+    @classmethod
+    def from_dicts(cls, rewards):
+        store = cls()
+        for reward in rewards:
+            store.tx_hashes.append(reward.get("tx_hash"))
+            store.timestamps.append(iso_to_epoch(reward.get("tx_created")))
+            store.recv_coins.append(reward.get("recv_coins"))
+            token = reward.get("token")
+            store.tokens.append(sys.intern(token) if isinstance(token, str) else token)
+        return store
+
+    def _hashes(self):
+        return self.tx_hashes
+
+    def _columns(self):
+        return [self.tx_hashes, self.timestamps, self.recv_coins, self.tokens]
+
+    def _from_columns(self, columns):
+        return RewardList(*columns)
+
+    def _record(self, i):
+        return {
+            "tx_hash": self.tx_hashes[i],
+            "tx_created": epoch_to_iso(self.timestamps[i]),
+            "recv_coins": self.recv_coins[i],
+            "token": self.tokens[i],
+        }
+
+# Full wallet history, every transaction kept as its own encoded JSON document
+class TxHistory:
+    __slots__ = ("hashes", "encoded", "timestamps")
+
+    def __init__(self, hashes=None, encoded=None, timestamps=None):
+        self.hashes = hashes if hashes is not None else []
+        self.encoded = encoded if encoded is not None else []
+        self.timestamps = timestamps if timestamps is not None else array("q")
+
+    @classmethod
+    def from_dicts(cls, txs):
+        return cls(
+            [tx.get("hash") for tx in txs],
+            [jsonlib.dumps_bytes(tx) for tx in txs],
+            array("q", (iso_to_epoch(tx.get("tx_created")) for tx in txs)),
+        )
+
+    def __len__(self):
+        return len(self.encoded)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return TxHistory(self.hashes[index], self.encoded[index], self.timestamps[index])
+        return jsonlib.loads(self.encoded[index])
+
+    def __iter__(self):
+        for encoded in self.encoded:
+            yield jsonlib.loads(encoded)
+
+    def __add__(self, other):
+        return TxHistory(self.hashes + other.hashes, self.encoded + other.encoded, self.timestamps + other.timestamps)
+
+    def hash_at(self, i):
+        return self.hashes[i]
+
+    def to_json(self):
+        return jsonlib.fragment(b"[" + b",".join(self.encoded) + b"]")
+
+    def iter_json(self, rows=JSON_CHUNK_ROWS):
+        yield b"["
+        for start in range(0, len(self.encoded), rows):
+            if start:
+                yield b","
+            yield b",".join(self.encoded[start:start + rows])
+        yield b"]"
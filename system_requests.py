@@ -1,16 +1,23 @@
 from sys import platform
 from utils import utils
 from logconfig import logger
+from threadpool import run_on_threadpool
 import requests, psutil, socket, time, os
+from collections import deque
 import platform
 
 class SystemRequests:
+    USAGE_SAMPLE_INTERVAL = 5 # seconds
+    USAGE_SAMPLE_WINDOW = 900 # 15 minutes
+
     def __init__(self):
         logger.info("Initializing SystemRequests...")
+        self._usage_samples = deque(maxlen=self.USAGE_SAMPLE_WINDOW // self.USAGE_SAMPLE_INTERVAL)
+        version_future = run_on_threadpool(self.get_node_version) # RPC round trip, let it run meanwhile
         self._node_pid = self.get_node_pid()
         self._hostname = self.get_system_hostname()
         self._is_running_as_service = self.is_running_as_service()
-        self._current_node_version = self.get_node_version()
+        self._current_node_version = version_future.result() if version_future else self.get_node_version()
         self._current_platform = platform.system()
         # These can be initialized here, they are static after all
         logger.info(f"Node PID: {self._node_pid}")
@@ -46,6 +53,10 @@ class SystemRequests:
     def get_node_pid(self):
         try:
             logger.debug("Fetching node PID...")
+            own_process = psutil.Process()
+            if own_process.name() == "cellframe-node": # plugins run inside the node, no need to scan every process
+                logger.debug(f"PID for Cellframe node is {own_process.pid}")
+                return own_process.pid
             for proc in psutil.process_iter(attrs=["pid", "name"]):
                 name = proc.info.get("name")
                 if name == "cellframe-node":
@@ -84,20 +95,61 @@ class SystemRequests:
             logger.error(f"An error occurred while fetching current node version: {e}", exc_info=True)
             return None
 
+    def sample_node_usage(self):
+        process = None
+        while True:
+            try:
+                if process is None or not process.is_running():
+                    if not self._node_pid:
+                        logger.warning("No node PID, CPU and memory sampling will not start")
+                        return
+                    process = psutil.Process(self._node_pid)
+                    process.cpu_percent(interval=None) # first call only sets the baseline
+                else:
+                    cpu_usage = process.cpu_percent(interval=None) / psutil.cpu_count()
+                    memory_usage_mb = process.memory_info().rss / 1024 / 1024
+                    self._usage_samples.append((time.monotonic(), cpu_usage, memory_usage_mb))
+            except Exception as e:
+                logger.error(f"An error occurred while sampling node usage: {e}", exc_info=True)
+                process = None
+            time.sleep(self.USAGE_SAMPLE_INTERVAL)
+
+    def _get_usage_averages(self, index):
+        samples = list(self._usage_samples)
+        if not samples:
+            return None
+        now = time.monotonic()
+        averages = {}
+        for label, window in (("1m", 60), ("5m", 300), ("15m", 900)):
+            values = [s[index] for s in samples if now - s[0] <= window]
+            averages[label] = round(sum(values) / len(values), 2) if values else None
+        return averages
+
     def get_node_cpu_usage(self):
         try:
-            PID = self._node_pid
-            if not PID:
+            if not self._usage_samples:
                 return None
-            logger.debug("Fetching node CPU usage...")
-            process = psutil.Process(PID)
-            cpu_usage = process.cpu_percent(interval=1) / psutil.cpu_count()
+            cpu_usage = self._usage_samples[-1][1]
             logger.debug(f"Node CPU usage is {cpu_usage}%")
             return cpu_usage
         except Exception as e:
             logger.error(f"An error occurred while fetching node CPU usage: {e}", exc_info=True)
             return None
 
+    def get_node_cpu_usage_avg(self):
+        try:
+            return self._get_usage_averages(1)
+        except Exception as e:
+            logger.error(f"An error occurred while fetching node CPU usage averages: {e}", exc_info=True)
+            return None
+
+    def get_node_memory_usage_avg(self):
+        try:
+            return self._get_usage_averages(2)
+        except Exception as e:
+            logger.error(f"An error occurred while fetching node memory usage averages: {e}", exc_info=True)
+            return None
+
     def get_node_memory_usage(self):
         try:
             PID = self._node_pid
@@ -0,0 +1,114 @@
+import json, os, sys, threading, time, types, unittest, urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# The plugin runs inside the node, which provides DAP; config falls back to defaults without it
+sys.modules.setdefault("DAP", types.ModuleType("DAP"))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rpc_router import Backend, RpcRouter
+
+class StandInRpc(BaseHTTPRequestHandler):
+    # Answers every JSON-RPC call, unless the server is told to be down or slow
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if self.server.mode == "down":
+            self.send_error(503)
+            return
+        if self.server.mode == "slow":
+            time.sleep(0.2)
+        body = json.dumps({"id": request.get("id"), "result": [self.server.name]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+class RpcRouterTest(unittest.TestCase):
+    def setUp(self):
+        self.servers = {}
+        self.backends = []
+        for name in ("remote", "local"):
+            server = ThreadingHTTPServer(("127.0.0.1", 0), StandInRpc)
+            server.name = name
+            server.mode = "up"
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            self.servers[name] = server
+            self.backends.append(Backend(name, self._sender(server)))
+        self.remote, self.local = self.backends
+        self.router = RpcRouter(self.backends)
+
+    def tearDown(self):
+        for server in self.servers.values():
+            server.shutdown()
+            server.server_close()
+
+    @staticmethod
+    def _sender(server):
+        def send(request_data, timeout):
+            request = urllib.request.Request(
+                f"http://127.0.0.1:{server.server_address[1]}/",
+                data=json.dumps(request_data).encode(),
+                headers={"Content-Type": "application/json"},
+            )
+            with urllib.request.urlopen(request, timeout=timeout or 5) as response:
+                return json.loads(response.read())
+        return send
+
+    def call(self):
+        return self.router.call({"method": "tx_history", "id": "1"}, timeout=5)["result"][0]
+
+    def open_remote(self):
+        self.servers["remote"].mode = "down"
+        for _ in range(Backend.FAILURE_THRESHOLD):
+            self.assertEqual(self.call(), "local")
+        self.assertEqual(self.remote.state, "open")
+
+    def test_routes_to_fastest_backend(self):
+        self.servers["remote"].mode = "slow"
+        for _ in range(5):
+            self.call()
+        self.assertEqual(self.call(), "local")
+        self.assertLess(self.local.latency, self.remote.latency)
+
+    def test_open_circuit_is_skipped(self):
+        self.open_remote()
+        calls = self.remote.calls
+        self.assertEqual(self.call(), "local")
+        self.assertEqual(self.remote.calls, calls)
+
+    def test_probe_closes_circuit_again(self):
+        self.open_remote()
+        self.servers["remote"].mode = "up"
+        self.remote.cooldown = 0
+        self.assertTrue(self.remote.available())
+        self.assertEqual(self.remote.state, "open") # checking doesn't start a probe
+        self.assertEqual(self.call(), "remote")
+        self.assertEqual(self.remote.state, "closed")
+
+    def test_failed_probe_doubles_cooldown(self):
+        self.open_remote()
+        self.remote.opened_at -= Backend.COOLDOWN
+        self.assertEqual(self.call(), "local")
+        self.assertEqual(self.remote.state, "open")
+        self.assertEqual(self.remote.cooldown, Backend.COOLDOWN * 2)
+
+    def test_recovered_backend_takes_over_when_other_fails(self):
+        # Remote is measured slower, so local would answer first if the probe were not sent
+        self.servers["remote"].mode = "slow"
+        for _ in range(3):
+            self.call()
+        for _ in range(Backend.FAILURE_THRESHOLD):
+            self.remote.record_failure()
+        self.servers["remote"].mode = "up"
+        self.remote.cooldown = 0
+        self.call()
+        self.servers["local"].mode = "down"
+        for _ in range(3):
+            self.assertEqual(self.call(), "remote")
+        self.assertEqual(self.remote.state, "closed")
+
+if __name__ == "__main__":
+    unittest.main()
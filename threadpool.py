@@ -1,16 +1,135 @@
+import asyncio, threading, time
 from concurrent.futures import ThreadPoolExecutor
 from logconfig import logger
 
-# global threadpool
+# Separate thread pools ("lanes") so that a big cache rebuild or a slow download never
+# queues in front of API requests. Every lane has its own workers and a bounded queue.
 
-threadpool = ThreadPoolExecutor()
+class Lane:
+    WAIT_SMOOTHING = 0.2
 
-def run_on_threadpool(func, *args, **kwargs):
+    def __init__(self, name, workers, max_queue, block_when_full=False):
+        self.name = name
+        self.workers = workers
+        self.max_queue = max_queue
+        # Background work waits for room, interactive work is turned away instead of piling up
+        self.block_when_full = block_when_full
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"{name}-lane")
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.avg_wait = 0.0
+        self.max_wait = 0.0
+
+    def submit(self, func, *args, **kwargs):
+        if not self._slots.acquire(blocking=self.block_when_full):
+            with self._lock:
+                self.rejected += 1
+            raise RuntimeError(f"{self.name} lane is full ({self.max_queue} queued)")
+        return self._submit_acquired(func, *args, **kwargs)
+
+    def try_submit(self, func, *args, **kwargs):
+        # Never waits for room, None when the lane is full
+        if not self._slots.acquire(blocking=False):
+            return None
+        return self._submit_acquired(func, *args, **kwargs)
+
+    def _submit_acquired(self, func, *args, **kwargs):
+        submitted = time.monotonic()
+        with self._lock:
+            self.queued += 1
+
+        def run():
+            waited = time.monotonic() - submitted
+            with self._lock:
+                self.queued -= 1
+                self.running += 1
+                self.avg_wait += self.WAIT_SMOOTHING * (waited - self.avg_wait)
+                self.max_wait = max(self.max_wait, waited)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.running -= 1
+                    self.completed += 1
+                self._slots.release()
+
+        def cancelled(future):
+            # A future cancelled while still queued never runs, give its slot back here
+            if future.cancelled():
+                with self._lock:
+                    self.queued -= 1
+                self._slots.release()
+
+        try:
+            future = self._executor.submit(run)
+        except Exception:
+            with self._lock:
+                self.queued -= 1
+            self._slots.release()
+            raise
+        future.add_done_callback(cancelled)
+        return future
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "running": self.running,
+                "queued": self.queued,
+                "max_queue": self.max_queue,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "avg_wait_ms": round(self.avg_wait * 1000, 1),
+                "max_wait_ms": round(self.max_wait * 1000, 1),
+            }
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+SLOW_IO = "slow_io"
+RPC_BATCH = "rpc_batch"
+LOOP_SUBMIT_RETRY = 0.05 # seconds between tries while a lane is full
+
+lanes = {
+    INTERACTIVE: Lane(INTERACTIVE, workers=8, max_queue=64), # request fan-out
+    BACKGROUND: Lane(BACKGROUND, workers=4, max_queue=32, block_when_full=True), # cache refreshes
+    SLOW_IO: Lane(SLOW_IO, workers=4, max_queue=16), # downloads, scraping, external tools
+    # Batched node_cli calls sent one by one, one worker per pooled socket connection. Not the
+    # background lane, its workers wait on these calls.
+    RPC_BATCH: Lane(RPC_BATCH, workers=4, max_queue=32, block_when_full=True),
+}
+
+def _submit(lane, func, *args, **kwargs):
     try:
         logger.debug(
-            f"Submitting {func.__name__} to threadpool"
+            f"Submitting {func.__name__} to the {lane} lane"
         )
-        return threadpool.submit(func, *args, **kwargs)
+        return lanes[lane].submit(func, *args, **kwargs)
     except Exception as e:
-        logger.error(f"Failed to submit {func.__name__} to threadpool: {e}", exc_info=True)
-        return None
\ No newline at end of file
+        logger.error(f"Failed to submit {func.__name__} to the {lane} lane: {e}", exc_info=True)
+        return None
+
+def run_on_threadpool(func, *args, **kwargs):
+    return _submit(INTERACTIVE, func, *args, **kwargs)
+
+def run_in_background(func, *args, **kwargs):
+    return _submit(BACKGROUND, func, *args, **kwargs)
+
+def run_slow_io(func, *args, **kwargs):
+    return _submit(SLOW_IO, func, *args, **kwargs)
+
+async def run_in_background_from_loop(func, *args):
+    # For coroutines on an event loop: a full background lane is waited out here without
+    # blocking the loop, which run_in_background would do
+    lane = lanes[BACKGROUND]
+    while True:
+        future = lane.try_submit(func, *args)
+        if future is not None:
+            return await asyncio.wrap_future(future)
+        await asyncio.sleep(LOOP_SUBMIT_RETRY)
+
+def lane_stats():
+    return {name: lane.stats() for name, lane in lanes.items()}
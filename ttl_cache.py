@@ -0,0 +1,99 @@
+import functools, threading, time
+from collections import OrderedDict
+
+# Shared cache for live node calls: per-call TTL, LRU eviction once full and single-flight,
+# callers asking for a key that is already being fetched wait for that fetch.
+
+def usable(value):
+    # Helpers return None or an empty container when the node call failed
+    return value is not None and not (isinstance(value, (dict, list)) and not value)
+
+class _Flight:
+    __slots__ = ("event", "value", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+class TTLCache:
+    def __init__(self, maxsize=512):
+        self.maxsize = maxsize
+        self._entries = OrderedDict() # key -> (value, expires at)
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+
+    def get_or_fetch(self, key, ttl, fetch):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.event.wait()
+            if flight.error:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = fetch()
+            return flight.value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+                if flight.error is None and usable(flight.value):
+                    self._entries[key] = (flight.value, time.monotonic() + ttl)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.maxsize:
+                        self._entries.popitem(last=False)
+                        self.evictions += 1
+            flight.event.set()
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "hit_ratio": round((self.hits + self.coalesced) / lookups, 3) if lookups else None,
+            }
+
+live_cache = TTLCache()
+
+def cached(ttl, cache=live_cache):
+    # Caches a MasternodeHelpers method by its name and arguments
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args):
+            key = (func.__name__,) + args
+            return cache.get_or_fetch(key, ttl, lambda: func(self, *args))
+        return wrapper
+    return decorator
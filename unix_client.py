@@ -0,0 +1,78 @@
+import http.client, socket, threading
+from collections import deque
+from logconfig import logger
+
+# Small keep-alive HTTP client for the node_cli Unix socket. A handful of idle
+# connections are kept around and reused, every call has its own timeout.
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path, timeout=None):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except Exception:
+            sock.close()
+            raise
+        self.sock = sock
+
+class UnixSocketClient:
+    # Errors that mean a reused connection was closed by the node in the meantime
+    STALE_ERRORS = (http.client.RemoteDisconnected, http.client.BadStatusLine, BrokenPipeError, ConnectionResetError)
+
+    def __init__(self, socket_path, pool_size=4, timeout=15):
+        self.socket_path = socket_path
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._idle = deque()
+        self._lock = threading.Lock()
+
+    def _acquire(self, timeout):
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+        if conn is None:
+            return UnixHTTPConnection(self.socket_path, timeout=timeout), False
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        return conn, True
+
+    def _release(self, conn):
+        with self._lock:
+            if len(self._idle) < self.pool_size:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def post(self, path, body, headers=None, timeout=None):
+        # Returns (status, body bytes), raises on connection errors and timeouts
+        timeout = self.timeout if timeout is None else timeout
+        while True:
+            conn, reused = self._acquire(timeout)
+            try:
+                conn.request("POST", path, body=body, headers=headers or {})
+                response = conn.getresponse()
+                data = response.read()
+            except self.STALE_ERRORS:
+                conn.close()
+                if reused:
+                    logger.debug("Pooled node_cli connection was closed, reconnecting")
+                    continue
+                raise
+            except Exception:
+                conn.close()
+                raise
+            if response.will_close:
+                conn.close()
+            else:
+                self._release(conn)
+            return response.status, data
+
+    def close(self):
+        with self._lock:
+            while self._idle:
+                self._idle.pop().close()
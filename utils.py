@@ -1,12 +1,14 @@
-import os, re, requests, requests_unixsocket, secrets
+import os, re, requests, secrets
 from exceptions import UnsupportedPlatformError, RequestError
 import jsonlib
-from http.client import RemoteDisconnected
 from logconfig import logger
 from datetime import datetime
 from config import Config
 from packaging import version
 from command_runner import command_runner
+from unix_client import UnixSocketClient
+from rpc_router import RpcRouter, Backend
+from threadpool import lanes, RPC_BATCH
 import platform
 
 class Utils:
@@ -15,53 +17,124 @@ class Utils:
         self._generate_random_token = self.generate_random_token()
         self._rpc_session = requests.Session()
         if platform.system() == "Linux":
-            self._unix_session = requests_unixsocket.Session()
-            self._unix_url = "http+unix://%2Fopt%2Fcellframe-node%2Fvar%2Frun%2Fnode_cli/connect"
+            self._unix_client = UnixSocketClient("/opt/cellframe-node/var/run/node_cli", timeout=Config.RPC_TIMEOUT)
+            self._unix_path = "/connect"
+            self._batch_supported = None # unknown until the first batch
         else:
             raise UnsupportedPlatformError("Not running on Linux")
         self._rpc_url = "http://dev.rpc.cellframe.net"
         self._rpc_session_headers = {"Content-Type": "application/json"}
+        # Calls that either the public RPC or our own node can answer
+        self._rpc_router = RpcRouter([
+            Backend("remote", self._post_remote),
+            Backend("local", self._post_unix_routed),
+        ])
 
-    def send_request(self, method, subcommand, arguments=None, request_id="1", use_unix=False):
+    def _post_unix(self, request_data, timeout=None):
+        status, content = self._unix_client.post(
+            self._unix_path, jsonlib.dumps_bytes(request_data), self._rpc_session_headers, timeout=timeout
+        )
+        if status >= 400:
+            raise RequestError(f"Unix socket request returned HTTP {status}")
+        return jsonlib.loads(content)
+
+    def _post_unix_routed(self, request_data, timeout=None):
+        # As a router backend an error payload has to fail, or the router never tries the public RPC
+        return self._checked_payload(self._post_unix(request_data, timeout), "node_cli")
+
+    @staticmethod
+    def _checked_payload(data, source):
+        if not isinstance(data, dict):
+            raise RequestError(f"{source} returned an empty or malformed response")
+        if "error" in data:
+            error = data["error"]
+            raise RequestError(f"{source} returned error response: {error.get('message') if isinstance(error, dict) else error}")
+        if data.get("result") is None:
+            raise RequestError(f"{source} returned a response without result")
+        return data
+
+    @staticmethod
+    def _build_request(method, subcommand, arguments=None, request_id="1"):
         if subcommand and len(subcommand) > 1:
             subcommand = subcommand.split()
 
-        request_data = {
+        return {
             "method": method,
             "subcommand": subcommand,
             "arguments": arguments,
             "id": request_id
         }
 
+    def send_batch(self, calls, use_unix=True, timeout=None):
+        # calls are (method, subcommand, arguments) tuples. Results come back in the same order,
+        # a call that failed gets {"error": {"message": ...}} instead of failing the whole batch.
+        calls = list(calls)
+        if not calls:
+            return []
+
+        if use_unix and self._batch_supported is not False:
+            results = self._send_jsonrpc_batch(calls, timeout)
+            if results is not None:
+                return results
+
+        # No batch support, run the calls side by side over the pooled connections
+        futures = [
+            lanes[RPC_BATCH].submit(self.send_request, method, subcommand, arguments, use_unix=use_unix, timeout=timeout)
+            for method, subcommand, arguments in calls
+        ]
+        results = []
+        for (method, subcommand, _), future in zip(calls, futures):
+            try:
+                response = future.result()
+            except Exception as e:
+                response = None
+                logger.error(f"Batched {method} {subcommand} failed: {e}", exc_info=True)
+            results.append(response if response is not None else {"error": {"message": f"{method} {subcommand} failed"}})
+        return results
+
+    def _send_jsonrpc_batch(self, calls, timeout=None):
+        # One JSON-RPC batch request, None if the node doesn't understand batches
+        batch = [self._build_request(method, subcommand, arguments, str(i)) for i, (method, subcommand, arguments) in enumerate(calls)]
+        try:
+            response = self._post_unix(batch, timeout)
+        except Exception as e:
+            logger.warning(f"JSON-RPC batch request failed ({e}), sending the calls one by one")
+            return None
+
+        by_id = {str(item.get("id")): item for item in response if isinstance(item, dict)} if isinstance(response, list) else {}
+        if len(by_id) != len(calls):
+            if self._batch_supported is None:
+                logger.info("Node doesn't support JSON-RPC batches, batched calls are sent one by one")
+            self._batch_supported = False
+            return None
+
+        self._batch_supported = True
+        return [by_id.get(str(i)) or {"error": {"message": "missing response"}} for i in range(len(calls))]
+
+    def send_request(self, method, subcommand, arguments=None, request_id="1", use_unix=False, timeout=None):
+        request_data = self._build_request(method, subcommand, arguments, request_id)
+
         if use_unix:
             try:
-                resp = self._unix_session.post(self._unix_url, data=jsonlib.dumps(request_data), headers=self._rpc_session_headers)
-                resp.raise_for_status()
-                return jsonlib.loads(resp.content)
+                return self._post_unix(request_data, timeout)
             except Exception as e:
                 logger.error(f"Unix socket request failed: {e}", exc_info=True)
                 return None
 
         try:
-            resp = self._rpc_session.post(self._rpc_url, data=jsonlib.dumps(request_data), headers=self._rpc_session_headers)
-            resp.raise_for_status()
-            data = jsonlib.loads(resp.content)
-            if isinstance(data, dict) and "error" in data:
-                raise RequestError(f"RPC returned error response: {data['error']['message']}")
-            return data
-        except (requests.ConnectionError, RemoteDisconnected, RequestError) as e:
-            logger.warning(f"RPC request failed ({e}), falling back to Unix socket")
-            try:
-                resp = self._unix_session.post(self._unix_url, data=jsonlib.dumps(request_data), headers=self._rpc_session_headers)
-                resp.raise_for_status()
-                return jsonlib.loads(resp.content)
-            except Exception as e2:
-                logger.error(f"Unix socket fallback request failed: {e2}", exc_info=True)
-                return None
+            return self._rpc_router.call(request_data, timeout)
         except Exception as e:
-            logger.error(f"RPC request failed with unexpected error: {e}", exc_info=True)
+            logger.error(f"RPC request failed on every backend: {e}", exc_info=True)
             return None
 
+    def _post_remote(self, request_data, timeout=None):
+        resp = self._rpc_session.post(
+            self._rpc_url, data=jsonlib.dumps(request_data), headers=self._rpc_session_headers,
+            timeout=timeout or Config.RPC_TIMEOUT
+        )
+        resp.raise_for_status()
+        return self._checked_payload(jsonlib.loads(resp.content), "RPC")
+
     def cli_command(self, command, timeout=120,
                     is_pip_command=False,
                     is_shell_command=False,